@@ -1,12 +1,20 @@
 import gc
 from dataclasses import dataclass
-from time import time
-from typing import Optional
+from time import perf_counter_ns, thread_time_ns
+from typing import Callable, Optional
 
+import numpy as np
+import pandas as pd
 from cellxgene_census.experimental.ml import ExperimentDataPipe
 from torch.utils.data import DataLoader
 from tqdm import tqdm
 
+from benchmarks.consumer import Consumer
+from benchmarks.gc_stats import GcMode, GcRecorder, full_collections, gc_policy
+from benchmarks.io_stats import IO_COLS, IoSampler
+from benchmarks.mem import MemSampler
+from benchmarks.steady import SteadyState, block_period, steady_state
+
 
 @dataclass
 class Exp:
@@ -15,11 +23,72 @@ class Exp:
 
 
 @dataclass
-class Batch:
-    elapsed: float
-    n_rows: int
-    n_cols: int
-    gc: Optional[float] = None
+class Batches:
+    """Per-batch timings, stored as parallel (preallocated) NumPy arrays.
+
+    ``gc_ns`` is -1 for batches that weren't followed by a ``gc.collect()``; ``auto_gc_ns`` is the time spent in
+    automatic collections during each batch (included in ``elapsed_ns``), when recorded. ``io``, if present, holds each
+    batch's ``IO_COLS`` deltas (see ``benchmarks.io_stats``), one row per batch. ``step_ns``, if present, is the time
+    each batch spent in a simulated training step (see ``benchmarks.consumer``); ``elapsed_ns`` is then the time spent
+    waiting for data.
+    """
+    elapsed_ns: np.ndarray
+    n_rows: np.ndarray
+    gc_ns: np.ndarray
+    auto_gc_ns: np.ndarray
+    io: Optional[np.ndarray] = None
+    step_ns: Optional[np.ndarray] = None
+
+    @classmethod
+    def empty(cls, n: int, io: bool = False, step: bool = False) -> 'Batches':
+        return cls(
+            elapsed_ns=np.zeros(n, dtype=np.int64),
+            n_rows=np.zeros(n, dtype=np.int64),
+            gc_ns=np.full(n, -1, dtype=np.int64),
+            auto_gc_ns=np.zeros(n, dtype=np.int64),
+            io=np.zeros((n, len(IO_COLS)), dtype=np.int64) if io else None,
+            step_ns=np.zeros(n, dtype=np.int64) if step else None,
+        )
+
+    def __len__(self):
+        return len(self.elapsed_ns)
+
+    def resize(self, n: int) -> 'Batches':
+        """Truncate to (or grow to) ``n`` batches; new slots are initialized like in ``empty``."""
+        rv = Batches.empty(n, io=self.io is not None, step=self.step_ns is not None)
+        k = min(n, len(self))
+        rv.elapsed_ns[:k] = self.elapsed_ns[:k]
+        rv.n_rows[:k] = self.n_rows[:k]
+        rv.gc_ns[:k] = self.gc_ns[:k]
+        rv.auto_gc_ns[:k] = self.auto_gc_ns[:k]
+        if self.io is not None:
+            rv.io[:k] = self.io[:k]
+        if self.step_ns is not None:
+            rv.step_ns[:k] = self.step_ns[:k]
+        return rv
+
+    @property
+    def elapsed(self) -> np.ndarray:
+        return self.elapsed_ns / 1e9
+
+    @property
+    def gc(self) -> np.ndarray:
+        return np.where(self.gc_ns >= 0, self.gc_ns / 1e9, np.nan)
+
+    def to_df(self) -> pd.DataFrame:
+        df = pd.DataFrame({
+            'batch': np.arange(len(self)),
+            'elapsed_ns': self.elapsed_ns,
+            'n_rows': self.n_rows,
+            'gc_ns': pd.Series(self.gc_ns, dtype='Int64').mask(self.gc_ns < 0),
+            'auto_gc_ns': self.auto_gc_ns,
+        })
+        if self.step_ns is not None:
+            df['step_ns'] = self.step_ns
+        if self.io is not None:
+            for j, col in enumerate(IO_COLS):
+                df[col] = self.io[:, j]
+        return df
 
 
 @dataclass
@@ -28,7 +97,12 @@ class Epoch:
     n_cols: int
     elapsed: float
     gc: float
-    batches: list[Batch]
+    batches: Batches
+    steady: Optional[SteadyState] = None
+    # Whether the epoch was ended early, due to reaching `ci_target`
+    ci_stopped: bool = False
+    # Seconds spent in each setup phase (see `benchmark`)
+    phases: Optional[dict] = None
 
 
 @dataclass
@@ -44,6 +118,25 @@ class Results:
     mapped_collection: Optional[Method] = None
 
 
+def soma_read_stats(datapipe) -> Optional[tuple[float, int]]:
+    """(seconds spent reading SOMA chunks, number of chunks read) so far, if ``datapipe`` tracks them."""
+    stats = getattr(datapipe, 'stats', None)
+    if callable(stats):
+        stats = stats()
+    if stats is None or not hasattr(stats, 'elapsed'):
+        return None
+    return stats.elapsed, stats.n_soma_chunks
+
+
+def batch_ns(batches: Batches, n: int) -> np.ndarray:
+    """Time spent on each of the first ``n`` batches, including any ``gc.collect()`` (and simulated training step) that
+    followed it."""
+    rv = batches.elapsed_ns[:n] + np.maximum(batches.gc_ns[:n], 0)
+    if batches.step_ns is not None:
+        rv += batches.step_ns[:n]
+    return rv
+
+
 def benchmark(
         exp: Exp,
         batch_size: int = 1024,
@@ -52,54 +145,185 @@ def benchmark(
         progress_bar: bool = True,
         ensure_cuda: bool = True,
         max_batches: int | None = None,
+        mem_sampler: Optional[MemSampler] = None,
+        progress_freq: int | None = None,
+        on_progress: Optional[Callable[[int, int, float], None]] = None,
+        ci_target: float | None = None,
+        ci_level: float = 0.95,
+        ci_check_freq: int = 50,
+        gc_mode: GcMode | str = 'forced',
+        block_size: int | None = None,
+        gc_recorder: Optional[GcRecorder] = None,
+        io_sampler: Optional[IoSampler] = None,
+        consumer: Optional[Consumer] = None,
 ) -> Epoch:
+    """Time iterating over ``exp.loader``.
+
+    If ``ci_target`` is set, every ``ci_check_freq`` batches, warmup is detected and a ``ci_level`` confidence interval
+    for post-warmup samples/sec is computed (see ``benchmarks.steady``); the epoch ends early once that interval's
+    half-width is within ``ci_target`` (a fraction, e.g. 0.02 ⇒ ±2%) of the estimate. Given ``block_size``, the interval
+    is built from whole shuffle blocks (``block_size / batch_size`` batches each), so that each group includes its
+    block's (slow) read.
+
+    ``gc_mode`` (see ``benchmarks.gc_stats``) is applied after setup (creating the loader iterator, and fetching the
+    first batch); ``disabled`` mode collects at shuffle-block boundaries (unless the loader did a full collection during
+    the block, e.g. ``cellxgene_census``'s per-chunk one), which requires ``block_size``. If
+    ``gc_recorder`` is provided, every collection is recorded (and attributed to the batch during which it occurred).
+
+    Setup phases are timed, and returned as ``Epoch.phases``: ``shape_s`` (``datapipe.shape``; on first call, evaluates
+    the obs/var queries and fetches joinids), ``iter_s`` (creating the loader iterator), ``first_batch_s`` (fetching the
+    first batch, incl. planning and reading the first SOMA chunk), and ``first_chunk_s`` (the first chunk read alone, if
+    the datapipe tracks SOMA read stats, and the first batch is excluded).
+
+    If ``io_sampler`` is provided, each batch's I/O, page-fault, context-switch, and CPU-time deltas (for this process
+    and its children, e.g. DataLoader workers) are recorded in ``Batches.io``; sampling happens between batches, outside
+    their timings.
+
+    ``on_progress`` (called every ``progress_freq`` batches) is excluded from both per-batch timings and the epoch's
+    elapsed time.
+
+    If ``consumer`` is provided, each batch is passed to its ``step`` (simulating model compute between ``next()``
+    calls); step times are recorded in ``Batches.step_ns``, and ``Batches.elapsed_ns`` is the time spent waiting for
+    data.
+    """
+    phases = {}
+    t = perf_counter_ns()
     n_samples, n_vars = exp.datapipe.shape
+    phases['shape_s'] = (perf_counter_ns() - t) / 1e9
+    t = perf_counter_ns()
     loader_iter = exp.loader.__iter__()
+    phases['iter_s'] = (perf_counter_ns() - t) / 1e9
     if exclude_first_batch:
         # Optionally exclude first batch from benchmark, as it may include setup time
+        stats0 = soma_read_stats(exp.datapipe)
+        t = perf_counter_ns()
         next(loader_iter)
+        phases['first_batch_s'] = (perf_counter_ns() - t) / 1e9
+        stats1 = soma_read_stats(exp.datapipe)
+        if stats0 and stats1 and stats1[1] > stats0[1]:
+            phases['first_chunk_s'] = stats1[0] - stats0[0]
 
     num_iter = (n_samples + batch_size - 1) // batch_size if n_samples is not None else None
 
-    batches = []
     n_batches = num_iter if num_iter is not None else len(loader_iter)
     if max_batches and n_batches > max_batches:
         n_batches = max_batches
+    batches = Batches.empty(n_batches, io=io_sampler is not None, step=consumer is not None)
     batch_iter = enumerate(loader_iter)
     if progress_bar:
         batch_iter = tqdm(batch_iter, total=n_batches)
 
-    start_time = batch_time = time()
+    gc_mode = GcMode.parse(gc_mode)
+    offset = 1 if exclude_first_batch else 0
+    period = block_period(batch_size, block_size)
+
+    # Full collections as of the last block boundary, for skipping redundant `disabled`-mode collections
+    last_full = None
+
+    def collect_gc(i: int) -> bool:
+        nonlocal last_full
+        if gc_mode.forced:
+            return bool(gc_freq) and i % gc_freq == 0
+        if gc_mode.name == 'disabled' and block_size:
+            # Collect after the last batch of each shuffle block, unless the loader itself did during the block
+            start = (i + offset) * batch_size
+            if start // block_size == (start + batch_size) // block_size:
+                return False
+            n_full = full_collections()
+            redundant = n_full > last_full
+            last_full = n_full + (0 if redundant else 1)
+            return not redundant
+        return False
+
+    n = 0
+    ci_stopped = False
+    if mem_sampler:
+        mem_sampler.batch = n
+    if gc_recorder:
+        gc_recorder.batch = n
+        # Entering the policy may `gc.collect()` (e.g. before `gc.freeze()`)
+        gc_recorder.forced = True
 
-    for i, batch in batch_iter:
-        X = batch["x"] if isinstance(batch, dict) else batch[0]
-        # for pytorch DataLoader
-        # Merlin sends to cuda by default
-        if ensure_cuda and hasattr(X, "is_cuda") and not X.is_cuda:
-            X = X.cuda()
+    with gc_policy(gc_mode):
+        if gc_recorder:
+            gc_recorder.forced = False
+        if io_sampler:
+            io_sampler.start()
+        last_full = full_collections()
+        start_time = batch_time = perf_counter_ns()
+        for i, batch in batch_iter:
+            X = batch["x"] if isinstance(batch, dict) else batch[0]
+            # for pytorch DataLoader
+            # Merlin sends to cuda by default
+            if ensure_cuda and hasattr(X, "is_cuda") and not X.is_cuda:
+                X = X.cuda()
 
-        if num_iter is not None and i == num_iter:
-            break
+            if num_iter is not None and i == num_iter:
+                break
 
-        batch_elapsed = time() - batch_time
+            now = perf_counter_ns()
+            batch_elapsed = now - batch_time
+            step_elapsed = None
+            step_cpu_ns = 0
+            if consumer:
+                step_cpu = thread_time_ns()
+                consumer.step(X)
+                step_end = perf_counter_ns()
+                step_cpu_ns = thread_time_ns() - step_cpu
+                step_elapsed = step_end - now
+                now = step_end
 
-        gc_time = None
-        if gc_freq and i % gc_freq == 0:
-            gc_before = time()
-            gc.collect()
-            gc_time = time() - gc_before
+            if n == len(batches):
+                batches = batches.resize(2 * n or 1)
+            if io_sampler:
+                batches.io[n] = io_sampler.delta(step_cpu_ns=step_cpu_ns)
+            if collect_gc(i):
+                if gc_recorder:
+                    gc_recorder.forced = True
+                gc.collect()
+                batches.gc_ns[n] = perf_counter_ns() - now
+                if gc_recorder:
+                    gc_recorder.forced = False
 
-        n_rows, n_cols = X.shape
-        batches.append(Batch(elapsed=batch_elapsed, n_rows=n_rows, n_cols=n_cols, gc=gc_time))
-        batch_time = time()
+            batches.elapsed_ns[n] = batch_elapsed
+            if step_elapsed is not None:
+                batches.step_ns[n] = step_elapsed
+            batches.n_rows[n] = X.shape[0]
+            n += 1
+            if mem_sampler:
+                mem_sampler.batch = n
+            if gc_recorder:
+                gc_recorder.batch = n
+            if on_progress and progress_freq and n % progress_freq == 0:
+                # (batches done, rows done, seconds elapsed)
+                progress_start = perf_counter_ns()
+                on_progress(n, int(batches.n_rows[:n].sum()), (progress_start - start_time) / 1e9)
+                # Exclude the callback (e.g. a journal write + fsync) from the epoch's elapsed time (it's already outside
+                # per-batch timings, which restart below)
+                start_time += perf_counter_ns() - progress_start
+            if ci_target and n % ci_check_freq == 0:
+                steady = steady_state(batch_ns(batches, n), batches.n_rows[:n], level=ci_level, period=period)
+                if steady and steady.rel_ci <= ci_target:
+                    print(f'Converged after {n} batches (warmup: {steady.warmup_batches}): ±{steady.rel_ci:.2%}')
+                    ci_stopped = True
+                    break
+            batch_time = perf_counter_ns()
 
-    execution_time = time() - start_time
+    execution_time = (perf_counter_ns() - start_time) / 1e9
+    if gc_recorder:
+        gc_recorder.forced = True
     gc.collect()
+    batches = batches.resize(n)
+    if not exclude_first_batch and n:
+        phases['first_batch_s'] = batches.elapsed_ns[0] / 1e9
+    if gc_recorder:
+        batches.auto_gc_ns[:] = gc_recorder.auto_ns(n)
+    steady = steady_state(batch_ns(batches, n), batches.n_rows, level=ci_level, period=period)
 
-    total_rows = sum(batch.n_rows for batch in batches)
+    total_rows = int(batches.n_rows.sum())
     time_per_sample = 1e6 * execution_time / total_rows
     print(f'time per sample: {time_per_sample:.2f} μs')
-    total_gc = sum(batch.gc or 0 for batch in batches)
+    total_gc = batches.gc_ns[batches.gc_ns >= 0].sum() / 1e9
     samples_per_sec = total_rows / execution_time
     print(f'samples per sec: {samples_per_sec:.2f} samples/sec')
 
@@ -109,4 +333,7 @@ def benchmark(
         batches=batches,
         elapsed=execution_time,
         gc=total_gc,
+        steady=steady,
+        ci_stopped=ci_stopped,
+        phases=phases,
     )
@@ -8,6 +8,7 @@ import pandas as pd
 import pyarrow as pa
 from utz import err
 
+import cellxgene_census
 from benchmarks import COLLECTION_ID
 from somacore import ExperimentAxisQuery, AxisQuery
 import tiledbsoma
@@ -37,6 +38,17 @@ def get_dataset_ids(*args, **kwargs):
     )
 
 
+def open_experiment(
+        census_uri: Optional[str] = None,
+        census_version: Optional[str] = None,
+        organism: str = 'homo_sapiens',
+        tiledb_config: Optional[dict] = None,
+) -> Experiment:
+    # `tiledb_config` overrides Census' default TileDB config
+    census = cellxgene_census.open_soma(uri=census_uri, census_version=census_version, tiledb_config=tiledb_config)
+    return census["census_data"][organism]
+
+
 def subset_census(query: ExperimentAxisQuery, output_base_dir: str) -> None:
     """
     Subset the census cube to the given query, returning a new cube.
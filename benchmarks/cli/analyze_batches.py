@@ -0,0 +1,42 @@
+import pandas as pd
+from click import ClickException, option
+from utz import err
+
+from benchmarks.cli.base import cli
+from benchmarks.data_loader.analyze import EPOCH_COLS, analyze_batches as analyze
+from benchmarks.data_loader.db import append_df, read_df
+from benchmarks.data_loader.paths import DEFAULT_PQT_PATH, DEFAULT_BATCHES_PQT_PATH, DEFAULT_ANALYSIS_PQT_PATH
+
+SUMMARY_COLS = [
+    'epoch_id', 'n_batches', 'p50_ms', 'p99_ms', 'max_ms', 'tail10_share',
+    'fft_period', 'acf_period', 'acf_peak', 'gc_lift', 'block_lift', 'stall_source',
+]
+
+
+@cli.command('analyze-batches')
+@option('-a', '--all', 'reanalyze', is_flag=True, help='Re-analyze epochs already present in -o/--out-db-path (by default, only new epochs are analyzed)')
+@option('-d', '--db-path', default=DEFAULT_PQT_PATH, help=f'Epochs Parquet dataset (for each epoch\'s batch_size, gc_freq, block_size, and exclude_first_batch); defaults to {DEFAULT_PQT_PATH}')
+@option('-D', '--batches-db-path', default=DEFAULT_BATCHES_PQT_PATH, help=f'Per-batch timings Parquet dataset; defaults to {DEFAULT_BATCHES_PQT_PATH}')
+@option('-e', '--epoch-id', 'epoch_ids', multiple=True, help='Only analyze these epochs')
+@option('-o', '--out-db-path', default=DEFAULT_ANALYSIS_PQT_PATH, help=f'Append analysis rows (keyed by `epoch_id`) to this Parquet dataset; defaults to {DEFAULT_ANALYSIS_PQT_PATH}, pass "" to only print them')
+def analyze_batches(reanalyze, db_path, batches_db_path, epoch_ids, out_db_path):
+    """Analyze per-batch timings: latency CDF / tail share, periodicity, and alignment of slow batches with GC or
+    shuffle-block boundaries."""
+    batches_df = read_df(batches_db_path)
+    if batches_df.empty:
+        raise ClickException(f"No per-batch timings found in {batches_db_path} (run `alb data-loader` with -D/--batches-db-path)")
+    if epoch_ids:
+        batches_df = batches_df[batches_df.epoch_id.isin(epoch_ids)]
+    if out_db_path and not reanalyze and not batches_df.empty:
+        done = read_df(out_db_path, columns=['epoch_id'])
+        if not done.empty:
+            batches_df = batches_df[~batches_df.epoch_id.isin(set(done.epoch_id))]
+    if batches_df.empty:
+        err("No (new) epochs to analyze")
+        return
+    epochs_df = read_df(db_path, columns=['epoch_id', *EPOCH_COLS])
+    df = analyze(batches_df, epochs_df)
+    if out_db_path:
+        append_df(out_db_path, df, name='batch analyses')
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(df[[ col for col in SUMMARY_COLS if col in df ]].to_string(index=False))
@@ -1,12 +1,13 @@
-from functools import wraps
+from functools import partial, wraps
 from inspect import getfullargspec
 
-from click import group, option
+from click import Choice, group, option
 from somacore import AxisQuery
 
 import cellxgene_census
 from benchmarks import COLLECTION_ID
-from benchmarks.census import axis_query, get_datasets_df
+from benchmarks.census import axis_query, get_datasets_df, open_experiment
+from benchmarks.profiler import PROFILE_FORMATS
 
 collection_id_opt = option('-c', '--collection-id', default=COLLECTION_ID, help=f"Census collection ID to slice datasets from; default: {COLLECTION_ID}")
 census_uri_opt = option('-u', '--census-uri', help="Optional Census URI override, default is determined by -V/--census-version")
@@ -17,6 +18,12 @@ sorted_datasets_flag = option('-S', '--sorted-datasets', is_flag=True, help='Sor
 end_opt = option('-e', '--end', type=int, help='Slice datasets from `collection_id` ending at this index')
 n_vars_opt = option('-v', '--n-vars', default=20_000, help='Slice the first `n_vars` vars')
 
+tiledb_config_opt = option('-T', '--tiledb-config', 'tiledb_configs', multiple=True, help='<key>=<sweep spec>: set a TileDB config param, sweeping over each value, e.g. "sm.compute_concurrency_level=4,8,16"; recorded as `tiledb.<key>` columns. Takes precedence over buffer-size flags')
+
+tiledb_stats_flag = option('-L', '--tiledb-stats', is_flag=True, help='Enable TileDB stats around each epoch, and record bytes / tiles read, unfilter (decompression) time, S3 requests, etc. as `tdb_*` columns (only reads in the main process are observed, not in DataLoader workers)')
+
+profile_opt = option('-U', '--profile', 'profile_format', type=Choice(list(PROFILE_FORMATS)), help='Run the py-spy sampling profiler (incl. native frames, and DataLoader workers) during each epoch, write its samples in this format to -W/--profile-dir, and print the top functions by self time. Profiling adds some overhead to the measured throughput')
+
 
 def slice_opts(fn):
     @collection_id_opt
@@ -37,7 +44,8 @@ def slice_opts(fn):
         n_vars = kwargs['n_vars']
         spec = getfullargspec(fn)
         fn_kwargs = dict(**kwargs, query=None, obs_query=None, var_query=None)
-        if start is not None or end is not None:
+        # An explicit (e.g. local) `uri` takes precedence over slicing Census
+        if kwargs.get('uri') is None and (start is not None or end is not None):
             census = cellxgene_census.open_soma(uri=census_uri, census_version=census_version)
             datasets_df = get_datasets_df(census, collection_id, sort_values='dataset_total_cell_count' if sorted_datasets else None)
             dataset_ids = datasets_df.dataset_id.tolist()
@@ -49,11 +57,8 @@ def slice_opts(fn):
                 experiment = census["census_data"]["homo_sapiens"]
                 fn_kwargs['query'] = axis_query(experiment, dataset_ids, start=start, end=end, n_vars=n_vars)
             else:
-                def exp_fn():
-                    census = cellxgene_census.open_soma(uri=census_uri, census_version=census_version)
-                    return census["census_data"]["homo_sapiens"]
-
-                fn_kwargs['exp_fn'] = exp_fn
+                # `partial` (as opposed to a closure) can be pickled, e.g. to child processes
+                fn_kwargs['exp_fn'] = partial(open_experiment, census_uri=census_uri, census_version=census_version)
                 fn_kwargs['obs_query'] = AxisQuery(value_filter=datasets_query)
                 fn_kwargs['var_query'] = AxisQuery(coords=(slice(n_vars - 1),)) if n_vars else None
 
@@ -0,0 +1,19 @@
+from click import option
+from utz import err
+
+from benchmarks.cli.base import cli
+from benchmarks.data_loader.journal import compact as compact_journals
+from benchmarks.data_loader.paths import DEFAULT_PQT_PATH, DEFAULT_BATCHES_PQT_PATH, DEFAULT_MEM_PQT_PATH, DEFAULT_JOURNAL_DIR, DEFAULT_GC_PQT_PATH, DEFAULT_ANALYSIS_PQT_PATH
+
+
+@cli.command()
+@option('-d', '--db-path', default=DEFAULT_PQT_PATH, help=f'Epochs Parquet dataset to merge journaled epoch records into; defaults to {DEFAULT_PQT_PATH}')
+@option('-D', '--batches-db-path', default=DEFAULT_BATCHES_PQT_PATH, help=f'Per-batch timings Parquet dataset; defaults to {DEFAULT_BATCHES_PQT_PATH}, pass "" to skip')
+@option('-I', '--mem-db-path', default=DEFAULT_MEM_PQT_PATH, help=f'Memory samples Parquet dataset; defaults to {DEFAULT_MEM_PQT_PATH}, pass "" to skip')
+@option('-O', '--gc-db-path', default=DEFAULT_GC_PQT_PATH, help=f'GC events Parquet dataset; defaults to {DEFAULT_GC_PQT_PATH}, pass "" to skip')
+@option('-y', '--analysis-db-path', default=DEFAULT_ANALYSIS_PQT_PATH, help=f'Append per-batch timing analyses of compacted epochs (not already analyzed) to this Parquet dataset; defaults to {DEFAULT_ANALYSIS_PQT_PATH}, pass "" to skip')
+@option('-j', '--journal-dir', default=DEFAULT_JOURNAL_DIR, help=f'Directory containing `alb data-loader` JSONL journals; defaults to {DEFAULT_JOURNAL_DIR}')
+def compact(db_path, batches_db_path, mem_db_path, gc_db_path, analysis_db_path, journal_dir):
+    """Merge JSONL journals left by interrupted `alb data-loader` runs into the Parquet DBs."""
+    num_added = compact_journals(journal_dir, db_path, batches_db_path, mem_db_path, gc_db_path, analysis_db_path)
+    err(f"Added {num_added} epoch records to {db_path}")
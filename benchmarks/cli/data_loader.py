@@ -1,24 +1,34 @@
 import re
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from getpass import getuser
-from os.path import exists
+from os import getpid, makedirs, remove
+from os.path import join
 from socket import gethostname
 from subprocess import check_output, check_call, CalledProcessError
 from typing import Optional, Callable, Tuple
 
 import click
-import numpy as np
 import pandas as pd
 from click import option, argument
 from utz import err
 
-from benchmarks.benchmark import benchmark, Exp
-from benchmarks.cli.base import cli, slice_opts
-from benchmarks.data_loader.paths import DEFAULT_PQT_PATH
+from benchmarks.cli.base import cli, profile_opt, slice_opts, tiledb_config_opt, tiledb_stats_flag
+from benchmarks.consumer import CONSUMER_PROFILES
+from benchmarks.data_loader.analyze import analyze_batches
+from benchmarks.data_loader.config import Shard, completed_epochs, config_hash
+from benchmarks.data_loader.db import append_df, read_df
+from benchmarks.data_loader.journal import Journal, compact
+from benchmarks.data_loader.paths import DEFAULT_PQT_PATH, DEFAULT_BATCHES_PQT_PATH, DEFAULT_MEM_PQT_PATH, DEFAULT_JOURNAL_DIR, DEFAULT_ANALYSIS_PQT_PATH, DEFAULT_GC_PQT_PATH, DEFAULT_PROFILE_DIR
+from benchmarks.data_loader.run import run_config, run_isolated
+from benchmarks.data_loader.search import PROBE_BLOCKS, successive_halving
+from benchmarks.gc_stats import GC_MODES, GcMode
 from benchmarks.ec2 import ec2_instance_id, ec2_instance_type
-from cellxgene_census.experimental.ml import ExperimentDataPipe, experiment_dataloader
+from benchmarks.page_cache import CACHE_MODES, local_path
+from benchmarks.s3_emulator import tiledb_s3_config
+from benchmarks.steady import block_period
+from benchmarks.sweep import expand, filter_points, load_grid, parse_kv_sweeps, parse_size, parse_sweep, pows, sweep_arg
+from benchmarks.tiledb_config import PREFIX as TILEDB_PREFIX, point_tiledb_config, tiledb_config_axes
 from cellxgene_census.experimental.ml.pytorch import CHUNK_METHODS, ChunkMethod
-from tiledbsoma import SOMATileDBContext, Experiment
 
 
 def parse_delimited_arg(
@@ -50,14 +60,6 @@ def parse_delimited_arg(
     return _parse_delimited_arg
 
 
-def pows(start: int, stop: int, pow: int = 2):
-    rv = []
-    while start <= stop:
-        rv.append(start)
-        start *= pow
-    return rv
-
-
 def to_list(n: int | Tuple[int, int]) -> list[int]:
     if isinstance(n, int):
         return [n]
@@ -148,38 +150,138 @@ def parse_chunk_method(s: str) -> ChunkMethod:
     raise ValueError(f"Unrecognized 'chunk_method' string: {s}")
 
 
+# Sweep axes that can be set in a -G/--grid file (in addition to block_specs, chunk_methods, datapipe, filter), and
+# their value parsers
+GRID_AXES = {
+    'batch_size': int,
+    'py_buffer_size': parse_size,
+    'soma_buffer_size': parse_size,
+    'gc_freq': int,
+    'gc_mode': GcMode.parse,
+    'consumer_ms': float,
+}
+
+
+def point_env(point: dict) -> dict:
+    """Variables available to -f/--filter expressions: the point's params, with its block spec's fields flattened.
+
+    TileDB config params are exposed with "."s replaced by "_"s (e.g. ``sm_compute_concurrency_level``).
+    """
+    env = { k: v for k, v in point.items() if k != 'block_spec' and not k.startswith(TILEDB_PREFIX) }
+    env['gc_mode'] = str(point['gc_mode'])
+    env.update(asdict(point['block_spec']))
+    env.update({ k.removeprefix('dp_'): v for k, v in point.items() if k.startswith('dp_') })
+    env.update({ k.replace('.', '_'): v for k, v in point_tiledb_config(point).items() })
+    return env
+
+
+def dedupe_gc_freqs(points: list[dict]) -> list[dict]:
+    """``gc_freq`` only applies to the "forced" GC mode; clear it in other points, and drop the resulting duplicates."""
+    rv = []
+    for point in points:
+        if not point['gc_mode'].forced:
+            point = { **point, 'gc_freq': None }
+        if point not in rv:
+            rv.append(point)
+    return rv
+
+
+def point_desc(point: dict) -> str:
+    return ", ".join(f"{k}={v!r}" for k, v in point.items())
+
+
 @cli.command()
+@option('-a', '--adaptive', is_flag=True, help='Adaptive search: run all configs for a short probe (-p/--probe-batches), drop those dominated on (samples/sec, memory), and repeat with -H/--halving-factor× the batches, until only the frontier remains to run for the full -n/--max-batches and -E/--num-epochs. Probe epochs are persisted like any others, with a `search_round` column')
+@option('-A', '--datapipe-arg', 'datapipe_args', multiple=True, help='<key>=<sweep spec>: pass extra `ExperimentDataPipe` kwargs, sweeping over each value, e.g. "use_eager_fetch=true,false"; recorded as `dp_<key>` columns')
 @option('-b', '--block-specs', callback=lambda ctx, param, value: BlockSpec.parse(value), multiple=True, help='Block/Chunk sizes to test, e.g. "131072/[1,2048]", "2048x64"')
-@option('-B', '--batch-size', default=1024, type=int)
+@option('-B', '--batch-size', 'batch_sizes', callback=sweep_arg(int, default=[1024]), help=f'Batch size(s) to test (sweep spec, e.g. "256..4096:x2"); default: 1024')
 @option('-C', '--no-cuda-conversion', is_flag=True)
-@option('-d', '--db-path', default=DEFAULT_PQT_PATH, help=f'Append a row to this Parquet file for each epoch run, including samples/sec and other -M/--metadata; defaults to {DEFAULT_PQT_PATH}')
+@option('-d', '--db-path', default=DEFAULT_PQT_PATH, help=f'Append a row to this Parquet dataset (directory) for each epoch run, including samples/sec and other -M/--metadata; defaults to {DEFAULT_PQT_PATH}')
+@option('-D', '--batches-db-path', default=DEFAULT_BATCHES_PQT_PATH, help=f'Append per-batch timings to this Parquet dataset, keyed by each epoch record\'s `epoch_id`; defaults to {DEFAULT_BATCHES_PQT_PATH}, pass "" to disable')
 @option('-E', '--num-epochs', default=1, type=int)
+@option('-f', '--filter', 'filter_expr', help='Python expression over each sweep point\'s params (e.g. "chunk_size * batch_size <= 2**24"); only points where it\'s truthy are run')
 @option('-F', '--no-exclude-first-batch', 'no_exclude_first_batch', is_flag=True)
-@option('-g', '--gc-freq', default=10, type=int)
+@option('-g', '--gc-freq', 'gc_freqs', callback=sweep_arg(int, default=[10]), help='Run `gc.collect()` every this many batches (sweep spec); default: 10')
+@option('-H', '--halving-factor', default=2, type=int, help='With -a/--adaptive: multiply the probe budget by (and keep ≥1/N of candidates each round) this factor')
+@option('-G', '--grid', 'grid_path', help='YAML file mapping sweep axes to values/sweep specs, e.g. `batch_size: 256..4096:x2`; keys: block_specs, chunk_methods, batch_size, py_buffer_size, soma_buffer_size, gc_freq, gc_mode, consumer_ms, datapipe (a mapping of `ExperimentDataPipe` kwargs), tiledb (a mapping of TileDB config params), filter. Overrides the corresponding CLI flags')
+@option('-i', '--mem-interval', default=0., type=float, help='Sample memory usage (RSS/USS/PSS, summed over this process and DataLoader workers) every this many seconds, e.g. 0.1 (sampling walks the process tree in a background thread, which can perturb timings); 0 (default) ⇒ disable')
+@option('-I', '--mem-db-path', default=DEFAULT_MEM_PQT_PATH, help=f'Append -i/--mem-interval memory samples to this Parquet dataset, keyed by `epoch_id`; defaults to {DEFAULT_MEM_PQT_PATH}, pass "" to disable')
+@option('-j', '--journal-dir', default=DEFAULT_JOURNAL_DIR, help=f'Append each epoch\'s results to an fsync\'d JSONL journal in this directory as soon as they\'re produced, so that a crash/OOM/preemption mid-config doesn\'t lose completed epochs (merge leftover journals with `alb compact`); defaults to {DEFAULT_JOURNAL_DIR}, pass "" to disable')
+@option('-J', '--progress-freq', type=int, help='Also journal a "progress" record every this many batches')
+@option('-k', '--ci-target', type=float, help='End each epoch early, once the 95% confidence interval of post-warmup samples/sec is within this fraction of the estimate (e.g. 0.02 ⇒ ±2%); warmup length and the interval are recorded either way')
+@option('-l', '--null-batches', default=0, type=int, help='Before each config\'s epochs, time this many pre-built batches (of the same shape, with the same options, but never copied to CUDA) from a null loader, to measure the harness\'s own per-batch overhead; recorded as `harness_batch_s` (and `harness_latency_ns`, the floor of measurable per-batch latency), with `elapsed_net` = `elapsed` minus that overhead. 0 (default) ⇒ disable')
+@tiledb_stats_flag
 @option('-m', '--chunk-method', 'chunk_methods', callback=parse_delimited_arg(choices=CHUNK_METHODS, default=CHUNK_METHODS, fn=parse_chunk_method), help=f'Comma-delimited list of matrix conversion methods to test; options: [{", ".join(CHUNK_METHODS)}], default is all; unique prefixes accepted')
 @option('-M', '--metadata', multiple=True, help='<key>=<value> pairs to attach to the record persisted to the -d/--database')
 @option('-n', '--max-batches', type=int, default=0, help='Optional: exit after this many batches; 0 ⇒ no max')
-@option('-P', '--py-buffer-size', default=1024**3, type=int)
+@option('-N', '--shard', callback=lambda ctx, param, value: Shard.parse(value) if value else None, help='"<i>/<N>": only run every N-th config (of the full sweep), starting from the i-th; lets N instances split one sweep')
+@option('-o', '--gc-mode', 'gc_modes', callback=sweep_arg(GcMode.parse, default=[GcMode('forced')]), help=f'GC policy (sweep spec); options: [{", ".join(GC_MODES)}] ("threshold:<gen0>" sets the gen-0 threshold); default: "forced" (`gc.collect()` every -g/--gc-freq batches). Every collection is recorded to -O/--gc-db-path either way')
+@option('-O', '--gc-db-path', default=DEFAULT_GC_PQT_PATH, help=f'Append GC events (generation, duration, objects collected; attributed to batches) to this Parquet dataset, keyed by `epoch_id`; defaults to {DEFAULT_GC_PQT_PATH}, pass "" to disable')
+@option('-p', '--probe-batches', default=64, type=int, help=f'With -a/--adaptive: number of batches in the first round of probes; each config\'s first probe is extended to at least {PROBE_BLOCKS} shuffle blocks (block_size / batch_size batches each), so that it times block reads, and later rounds multiply that by -H/--halving-factor; default: 64')
+@option('-P', '--py-buffer-size', 'py_buffer_sizes', callback=sweep_arg(parse_size, default=[1024**3]), help='TileDB `py.init_buffer_bytes` (sweep spec, e.g. "256M,1G"); default: 1G')
 @option('-q', '--quiet', count=True, help='1x: disable progress bar')
+@option('-Q', '--io-stats', is_flag=True, help='Record per-batch I/O (`/proc/<pid>/io` read_bytes, rchar, syscr), page faults, context switches, and CPU time, summed over this process and DataLoader workers, in -D/--batches-db-path; epoch rows get totals, read amplification (`read_bytes_per_row`), and CPU utilization (`cpu_util`, `cpu_us_per_row`). Linux only')
 @option('-r', '--region', help="S3 region")
-@option('-z', '--soma-buffer-size', default=1024**3, type=int)
+@option('-R', '--resume', is_flag=True, help='Skip configs (identified by `config_hash`) whose -E/--num-epochs epochs are already present in -d/--db-path, and run only the missing epochs of partially-complete configs; configs with an OOM/timeout row are skipped')
+@option('-t', '--timeout', type=float, help='With -x/--isolate: kill each config\'s child process after this many seconds, record a `timeout` row, and move on')
+@tiledb_config_opt
+@profile_opt
+@option('-w', '--cache-mode', type=click.Choice(CACHE_MODES), default='as-is', help='OS page-cache state for a local URI\'s files before each epoch: "cold" evicts them (`posix_fadvise(DONTNEED)`), "warm" pre-reads them, "as-is" (default) leaves the cache alone (so later epochs are largely served from memory); recorded as `cache_mode`')
+@option('-W', '--profile-dir', default=DEFAULT_PROFILE_DIR, help=f'With -U/--profile: write each epoch\'s profile to this directory, as `<epoch_id>.<ext>` (recorded in the `profile_path` column); defaults to {DEFAULT_PROFILE_DIR}')
+@option('-x', '--isolate', is_flag=True, help='Run each config in a fresh child process; child crashes/OOMs are recorded as rows (with `oom`/`exitcode` set), and the sweep continues')
+@option('-X', '--mem-limit', callback=lambda ctx, param, value: parse_size(value), help='Cap each config\'s child-process address space (RLIMIT_AS) at this size (e.g. "48G"); implies -x/--isolate')
+@option('-y', '--analysis-db-path', default=DEFAULT_ANALYSIS_PQT_PATH, help=f'Append each epoch\'s per-batch timing analysis (tail share, periodicity, GC / block-boundary alignment of slow batches; see `alb analyze-batches`) to this Parquet dataset; defaults to {DEFAULT_ANALYSIS_PQT_PATH}, pass "" to disable')
+@option('-Y', '--consumer-ms', 'consumer_mss', callback=sweep_arg(float, default=[0.]), help='Simulate a training step of this many milliseconds after each batch (sweep spec, e.g. "0,10,50"), and record data-wait time (`data_wait_s`, `data_wait_frac`; per-batch `elapsed_ns`) separately from step time (`step_s`; per-batch `step_ns`); shows whether a config\'s prefetching keeps a trainer fed. Default: 0 (no consumer)')
+@option('--consumer-profile', type=click.Choice(CONSUMER_PROFILES), default='sleep', help='With -Y/--consumer-ms: how to simulate each step: "sleep" (default; idle, like a GPU step), "numpy" (NumPy matmuls: CPU-bound, GIL mostly released), or "spin" (pure-Python busy loop: CPU-bound, GIL held)')
+@option('-z', '--soma-buffer-size', 'soma_buffer_sizes', callback=sweep_arg(parse_size, default=[1024**3]), help='TileDB `soma.init_buffer_bytes` (sweep spec, e.g. "256M,1G"); default: 1G')
+@option('-Z', '--s3-endpoint', help='Read `s3://` URIs from an S3-compatible endpoint at this `<host>:<port>` (over plain HTTP, path-style; e.g. an `alb s3-serve` emulator); recorded as `s3_endpoint`')
 @argument('uri', required=False)  # e.g. `data/census-benchmark_2:3`; `alb download -s2 -e3
 @slice_opts
 def data_loader(
+        adaptive,
+        datapipe_args,
         block_specs,
-        batch_size,
+        batch_sizes,
+        batches_db_path,
         db_path,
         no_cuda_conversion,
         num_epochs,
+        filter_expr,
         no_exclude_first_batch,
+        ci_target,
+        null_batches,
+        tiledb_stats,
         chunk_methods,
-        gc_freq,
+        gc_freqs,
+        halving_factor,
+        grid_path,
+        mem_interval,
+        mem_db_path,
+        journal_dir,
+        progress_freq,
         metadata,
         max_batches,
-        py_buffer_size,
+        shard,
+        gc_modes,
+        gc_db_path,
+        probe_batches,
+        py_buffer_sizes,
+        io_stats,
         quiet,
         region,
-        soma_buffer_size,
+        resume,
+        timeout,
+        tiledb_configs,
+        profile_format,
+        cache_mode,
+        profile_dir,
+        isolate,
+        mem_limit,
+        analysis_db_path,
+        consumer_mss,
+        consumer_profile,
+        soma_buffer_sizes,
+        s3_endpoint,
         uri,
         # slice_opts
         collection_id,
@@ -194,18 +296,52 @@ def data_loader(
         var_query=None,
         total_cells=None,
 ):
-    """Benchmark loading batches into PyTorch, from a TileDB-SOMA experiment."""
-    tiledb_config = {
-        "py.init_buffer_bytes": py_buffer_size,
-        "soma.init_buffer_bytes": soma_buffer_size,
-    }
-    if region:
-        tiledb_config["vfs.s3.region"] = region
-
-    err(f"{chunk_methods=}")
-    err("Block specs:\n\t%s\n" % "\n\t".join(map(repr, block_specs)))
-
-    context = SOMATileDBContext(tiledb_config=tiledb_config)
+    """Benchmark loading batches into PyTorch, from a TileDB-SOMA experiment.
+
+    Each of -b/--block-specs, -m/--chunk-method, -B/--batch-size, -P/--py-buffer-size, -z/--soma-buffer-size,
+    -g/--gc-freq, -o/--gc-mode, -Y/--consumer-ms, -A/--datapipe-arg, and -T/--tiledb-config can take multiple values
+    (or a -G/--grid file can specify them); every point in their cartesian product (optionally filtered by -f/--filter)
+    is benchmarked (or, with -a/--adaptive, searched for the speed-vs-memory frontier).
+    """
+    if adaptive and not max_batches:
+        raise click.UsageError("-a/--adaptive requires -n/--max-batches (the full per-config batch budget)")
+    if cache_mode != 'as-is' and (exp_fn or not local_path(uri)):
+        raise click.UsageError(f"-w/--cache-mode {cache_mode} requires a local URI")
+    axes = dict(
+        block_spec=block_specs,
+        chunk_method=chunk_methods,
+        batch_size=batch_sizes,
+        py_buffer_size=py_buffer_sizes,
+        soma_buffer_size=soma_buffer_sizes,
+        gc_freq=gc_freqs,
+        gc_mode=gc_modes,
+        consumer_ms=consumer_mss,
+        **{ f'dp_{k}': v for k, v in parse_kv_sweeps(datapipe_args).items() },
+        **tiledb_config_axes(tiledb_configs),
+    )
+    if grid_path:
+        grid = load_grid(grid_path)
+        for k, v in grid.items():
+            if k in ('block_spec', 'block_specs'):
+                axes['block_spec'] = BlockSpec.parse(tuple(v) if isinstance(v, list) else v)
+            elif k in ('chunk_method', 'chunk_methods'):
+                axes['chunk_method'] = parse_sweep(v, fn=parse_chunk_method)
+            elif k in GRID_AXES:
+                axes[k] = parse_sweep(v, fn=GRID_AXES[k])
+            elif k == 'datapipe':
+                for dp_k, dp_v in v.items():
+                    axes[f'dp_{dp_k}'] = parse_sweep(dp_v)
+            elif k == 'tiledb':
+                for tdb_k, tdb_v in v.items():
+                    axes[f'{TILEDB_PREFIX}{tdb_k}'] = parse_sweep(tdb_v)
+            elif k == 'filter':
+                filter_expr = v
+            else:
+                raise click.BadParameter(f"Unrecognized grid axis: {k}", param_hint='-G/--grid')
+
+    err("Sweep axes:\n\t%s\n" % "\n\t".join(f"{k}: {v}" for k, v in axes.items()))
+    points = filter_points(dedupe_gc_freqs(expand(axes)), filter_expr, env=point_env)
+
     sha = check_output(['git', 'rev-parse', 'HEAD']).decode().strip()
     try:
         check_call(['git', 'diff', '--quiet', 'HEAD'])
@@ -215,108 +351,179 @@ def data_loader(
 
     exclude_first_batch = not no_exclude_first_batch
     ensure_cuda = not no_cuda_conversion
+    isolate = isolate or bool(mem_limit)
     alb_start_dt = pd.Timestamp.now()
-    for block_spec in block_specs:
-        for chunk_method in chunk_methods:
-            err(f"Running {chunk_method=}, {block_spec=}")
-            chunk_size = block_spec.chunk_size
-            chunks_per_block = block_spec.chunks_per_block
-            metadata_dict = {
-                'alb_start_dt': alb_start_dt,
-                'sha': sha_str,
-                'user': getuser(),
-                'hostname': gethostname(),
-                'uri': uri,
-                'chunk_method': chunk_method,
-                'batch_size': batch_size,
-                'max_batches': max_batches,
-                'chunk_size': chunk_size,
-                'chunks_per_block': chunks_per_block,
-                'block_size': block_spec.block_size,
-                'py_buffer_size': py_buffer_size,
-                'soma_buffer_size': soma_buffer_size,
-                'collection_id': collection_id,
-                'census_uri': census_uri,
-                'census_version': census_version,
-                'start_idx': start,
-                'end_idx': end,
-                'sorted_datasets': sorted_datasets,
-                'total_rows': total_cells,
-            }
-            metadata_dict.update(**{
-                k: v for k, v in
-                (m.split('=', 1) for m in metadata)
-            })
-            instance_id = ec2_instance_id()
-            if instance_id:
-                metadata_dict['instance_id'] = instance_id
-            instance_type = ec2_instance_type()
-            if instance_type:
-                metadata_dict['instance_type'] = instance_type
-            if exp_fn:
-                experiment = exp_fn()
-            else:
-                experiment = Experiment.open(uri, context=context)
-            datapipe = ExperimentDataPipe(
-                experiment,
-                measurement_name="RNA",
-                X_name="raw",
-                batch_size=batch_size,
-                shuffle=True,
-                soma_chunk_size=chunk_size,
-                shuffle_chunk_count=chunks_per_block,
-                obs_query=obs_query,
-                var_query=var_query,
-                chunk_method=chunk_method,
-                max_batches=max_batches + (1 if exclude_first_batch else 0),
-            )
-            loader = experiment_dataloader(datapipe)
-            exp = Exp(datapipe, loader)
-
-            epochs = []
-            records = []
-            for epoch_idx in range(num_epochs):
-                record = dict(
-                    epoch=epoch_idx,
-                    **metadata_dict,
-                )
-                start_dt = pd.Timestamp.now()
-                epoch = None
-                try:
-                    epoch = benchmark(
-                        exp,
-                        batch_size=batch_size,
-                        gc_freq=gc_freq,
-                        ensure_cuda=ensure_cuda,
-                        exclude_first_batch=exclude_first_batch,
-                        max_batches=max_batches,
-                        progress_bar=quiet < 1,
-                    )
-                except np.core._exceptions._ArrayMemoryError:
-                    record.update(oom=True)
-                end_dt = pd.Timestamp.now()
-                record.update(
-                    start_dt=start_dt,
-                    end_dt=end_dt,
-                    max_mem=datapipe.max_process_mem_usage_bytes,
-                )
-                if epoch:
-                    record.update(
-                        n_rows=epoch.n_rows,
-                        n_cols=epoch.n_cols,
-                        elapsed=epoch.elapsed,
-                        gc=epoch.gc,
-                    )
-                records.append(record)
-                epochs.append(epoch_idx)
-
-            records_df = pd.DataFrame(records)
-            if exists(db_path):
-                existing = pd.read_parquet(db_path)
-                err(f"Appending {len(records_df)} records to {len(existing)} existing, at {db_path}")
-                new_df = pd.concat([existing, records_df], ignore_index=True).reset_index(drop=True)
-                new_df.to_parquet(db_path, index=False)
-            else:
-                err(f"Writing {len(records_df)} records to {db_path}")
-                records_df.to_parquet(db_path, index=False)
-            err(records_df)
+    instance_id = ec2_instance_id()
+    instance_type = ec2_instance_type()
+    if shard:
+        points = shard.select(points)
+        err(f"Shard {shard}: running {len(points)} configs")
+    else:
+        err(f"Running {len(points)} configs")
+    if resume and journal_dir:
+        # Recover epochs journaled by previous (crashed) runs
+        compact(journal_dir, db_path, batches_db_path, mem_db_path, gc_db_path, analysis_db_path)
+    existing_df = read_df(db_path) if resume else pd.DataFrame()
+    completed = completed_epochs(existing_df)
+    journal = None
+    if journal_dir:
+        makedirs(journal_dir, exist_ok=True)
+        journal_path = join(journal_dir, f'{gethostname()}-{alb_start_dt.strftime("%Y%m%dT%H%M%S")}-{getpid()}.jsonl')
+        # Held (locked) for the duration of this run; `run_config` and its child processes append to it
+        journal = Journal(journal_path, lock=True)
+
+    def existing_records(h: str) -> pd.DataFrame:
+        if existing_df.empty or 'config_hash' not in existing_df:
+            return pd.DataFrame()
+        return existing_df[existing_df.config_hash == h]
+
+    def run_point(point: dict, max_batches: int, num_epochs: int, search_round: Optional[int] = None) -> pd.DataFrame:
+        """Run one sweep point, persist its results, and return its epoch records."""
+        block_spec = point['block_spec']
+        chunk_method = point['chunk_method']
+        datapipe_kwargs = {
+            k.removeprefix('dp_'): v
+            for k, v in point.items()
+            if k.startswith('dp_')
+        }
+        tiledb_config = {
+            "py.init_buffer_bytes": point['py_buffer_size'],
+            "soma.init_buffer_bytes": point['soma_buffer_size'],
+        }
+        if region:
+            tiledb_config["vfs.s3.region"] = region
+        if s3_endpoint:
+            tiledb_config.update(tiledb_s3_config(s3_endpoint))
+        tiledb_config.update(point_tiledb_config(point))
+        metadata_dict = {
+            'alb_start_dt': alb_start_dt,
+            'sha': sha_str,
+            'user': getuser(),
+            'hostname': gethostname(),
+            'uri': uri,
+            'chunk_method': chunk_method,
+            'batch_size': point['batch_size'],
+            'max_batches': max_batches,
+            'exclude_first_batch': exclude_first_batch,
+            'ci_target': ci_target,
+            'chunk_size': block_spec.chunk_size,
+            'chunks_per_block': block_spec.chunks_per_block,
+            'block_size': block_spec.block_size,
+            'py_buffer_size': point['py_buffer_size'],
+            'soma_buffer_size': point['soma_buffer_size'],
+            'gc_freq': point['gc_freq'],
+            'gc_mode': str(point['gc_mode']),
+            'cache_mode': cache_mode,
+            's3_endpoint': s3_endpoint,
+            'consumer_ms': point['consumer_ms'],
+            'consumer_profile': consumer_profile if point['consumer_ms'] else None,
+            'collection_id': collection_id,
+            'census_uri': census_uri,
+            'census_version': census_version,
+            'start_idx': start,
+            'end_idx': end,
+            'sorted_datasets': sorted_datasets,
+            'total_rows': total_cells,
+            **{ k: v for k, v in point.items() if k.startswith('dp_') or k.startswith(TILEDB_PREFIX) },
+        }
+        metadata_dict.update(**{
+            k: v for k, v in
+            (m.split('=', 1) for m in metadata)
+        })
+        if instance_id:
+            metadata_dict['instance_id'] = instance_id
+        if instance_type:
+            metadata_dict['instance_type'] = instance_type
+        if search_round is not None:
+            metadata_dict['search_round'] = search_round
+        metadata_dict['config_hash'] = config_hash(metadata_dict)
+        desc = point_desc(point)
+        first_epoch = 0
+        if resume:
+            first_epoch = completed.get(metadata_dict['config_hash'], 0)
+            if first_epoch is None:
+                err(f"Skipping {desc}: previously failed (OOM/timeout)")
+                return existing_records(metadata_dict['config_hash'])
+            if first_epoch >= num_epochs:
+                err(f"Skipping {desc}: {first_epoch} epochs already complete")
+                return existing_records(metadata_dict['config_hash'])
+        err(f"Running {desc}" + (f", from epoch {first_epoch}" if first_epoch else ""))
+        kwargs = dict(
+            metadata=metadata_dict,
+            uri=uri,
+            tiledb_config=tiledb_config,
+            chunk_method=chunk_method,
+            chunk_size=block_spec.chunk_size,
+            chunks_per_block=block_spec.chunks_per_block,
+            batch_size=point['batch_size'],
+            max_batches=max_batches,
+            num_epochs=num_epochs,
+            first_epoch=first_epoch,
+            gc_freq=point['gc_freq'],
+            gc_mode=str(point['gc_mode']),
+            exclude_first_batch=exclude_first_batch,
+            ensure_cuda=ensure_cuda,
+            progress_bar=quiet < 1,
+            mem_interval=mem_interval,
+            journal_path=journal.path if journal else None,
+            progress_freq=progress_freq,
+            ci_target=ci_target,
+            tiledb_stats=tiledb_stats,
+            io_stats=io_stats,
+            cache_mode=cache_mode,
+            null_batches=null_batches,
+            consumer_ms=point['consumer_ms'],
+            consumer_profile=consumer_profile,
+            profile_format=profile_format,
+            profile_dir=profile_dir,
+            datapipe_kwargs=datapipe_kwargs,
+            exp_fn=exp_fn,
+            obs_query=obs_query,
+            var_query=var_query,
+        )
+        if isolate:
+            results = list(run_isolated(mem_limit=mem_limit, timeout=timeout, **kwargs))
+        else:
+            results = []
+            run_config(emit=results.append, **kwargs)
+
+        records_df = pd.DataFrame([ result.record for result in results ])
+        append_df(db_path, records_df)
+        batches_dfs = [ result.batches for result in results if result.batches is not None ]
+        if batches_dfs:
+            batches_df = pd.concat(batches_dfs, ignore_index=True)
+            if batches_db_path:
+                append_df(batches_db_path, batches_df, name='batches')
+            if analysis_db_path:
+                append_df(analysis_db_path, analyze_batches(batches_df, records_df), name='batch analyses')
+        mem_dfs = [ result.mem for result in results if result.mem is not None ]
+        if mem_db_path and mem_dfs:
+            append_df(mem_db_path, pd.concat(mem_dfs, ignore_index=True), name='memory samples')
+        gc_dfs = [ result.gc for result in results if result.gc is not None ]
+        if gc_db_path and gc_dfs:
+            append_df(gc_db_path, pd.concat(gc_dfs, ignore_index=True), name='GC events')
+        err(records_df)
+        if resume:
+            # Merge any epochs run in previous invocations
+            records_df = pd.concat([ existing_records(metadata_dict['config_hash']), records_df ], ignore_index=True)
+        return records_df
+
+    if adaptive:
+        successive_halving(
+            points,
+            run=run_point,
+            max_batches=max_batches,
+            num_epochs=num_epochs,
+            probe_batches=probe_batches,
+            factor=halving_factor,
+            desc=point_desc,
+            min_batches=lambda point: PROBE_BLOCKS * block_period(point['batch_size'], point['block_spec'].block_size),
+        )
+    else:
+        for point in points:
+            run_point(point, max_batches, num_epochs)
+
+    if journal:
+        # Everything journaled has been persisted to the DBs
+        journal.close()
+        remove(journal.path)
@@ -20,6 +20,7 @@ DEFAULT_MARKER_SIZE_ANCHOR = '65536=10'
 @option('-D', '--dataset-slice', callback=lambda ctx, param, value: DatasetSlice.parse(value) if value else None, help="Filter to DB entries matching this URI")
 @option('-h', '--hostname-rgx', help='Filter to DB entries matching this hostname regex')
 @option('-i', '--instance-type', help='Optional: filter to DB entries run on this EC2 `instance_type`')
+@option('-m', '--mem-col', help='Memory column to plot on the x-axis (default: `max_mem`); e.g. `peak_pss` or `steady_pss`, sampled by `alb data-loader -i/--mem-interval`')
 @option('-n', '--max-batches', type=int, default=0, help='Optional: filter to DB entries with this `max_batch` set')
 @option('-o', '--out-dir', help='Directory (under -O/--out-root) to write the executed notebook – and associated plot data – to')
 @option('-O', '--no-open', is_flag=True, help="Don't attempt to `open` the generated HTML plot")
@@ -38,6 +39,7 @@ def data_loader_nb(
         dataset_slice: DatasetSlice,
         hostname_rgx,
         instance_type,
+        mem_col,
         max_batches,
         out_dir: str,
         no_open,
@@ -86,6 +88,7 @@ def data_loader_nb(
     if ann_offset: parameters['ann_offset'] = ann_offset
     if ann_arrow_offset: parameters['ann_arrow_offset'] = ann_arrow_offset
     if ann_size: parameters['ann_size'] = ann_size
+    if mem_col: parameters['mem_col'] = mem_col
 
     err(f"Running papermill: {nb_path} {out_nb_path}")
     err(f"{parameters=}")
@@ -1,8 +1,11 @@
 from benchmarks.cli.base import cli
+from benchmarks.cli.analyze_batches import analyze_batches
+from benchmarks.cli.compact import compact
 from benchmarks.cli.data_loader import data_loader
 from benchmarks.cli.data_loader_nb import data_loader_nb
 from benchmarks.cli.download import download
 from benchmarks.cli.read_chunks import read_chunks
+from benchmarks.cli.s3_serve import s3_serve
 
 if __name__ == '__main__':
     cli()
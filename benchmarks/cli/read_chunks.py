@@ -1,118 +1,411 @@
-from benchmarks.cli.base import cli
+from benchmarks.cli.base import cli, profile_opt, tiledb_config_opt, tiledb_stats_flag
+from benchmarks.coo_kernels import Buffers, coo_to_csr, lut_rows, scatter_dense, searchsorted_rows
+from benchmarks.data_loader.db import append_df
+from benchmarks.ec2 import ec2_instance_type
+from benchmarks.paths import NOTEBOOKS_DIR
+from benchmarks.profiler import PROFILE_FORMATS, Profiler, print_top
+from benchmarks.shuffle import SHUFFLE_MODES, Shuffle, obs_tile_extent, shuffle_joinids, tiles_per_chunk
+from benchmarks.sweep import expand, sweep_arg
+from benchmarks.tiledb_config import PREFIX as TILEDB_PREFIX, effective_tiledb_config, point_tiledb_config, tiledb_config_axes
+from benchmarks.tiledb_stats import PREFIX as TDB_PREFIX, TiledbStats
 
 import click
 
+import pandas as pd
 import tiledbsoma as soma
 import numpy as np
+import pyarrow as pa
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import product
+from os.path import join
+from socket import gethostname
+from typing import Iterator, NamedTuple, Optional
+from uuid import uuid4
 from utz import err, silent
 
+NB_DIR = join(NOTEBOOKS_DIR, 'read-chunks')
+DEFAULT_PQT_PATH = join(NB_DIR, 'results')
+DEFAULT_PROFILE_DIR = join(NB_DIR, 'profiles')
+# Per-run columns of persisted rows (besides `run_metadata`, TileDB config params, and `tdb_*` stats)
+RESULT_COLS = [
+    'start_dt', 'method', 'chunk_size', 'shuffle', 'tiles_per_chunk', 'lookahead', 'coord_order', 'rep', 'n_cells', 'nnz',
+    'elapsed', 'restore_s', 'kernel_s', 'kernel_ns_per_nnz', 'nnz_per_sec', 'cells_per_sec', 'profile_path', 'tiledb_config',
+]
 
-def read_table(X, obs_joinids, soma_chunk, var_slice, log):
-    total_read = 0
-    for idx in range(0, len(obs_joinids), soma_chunk):
-        chunk_obs_ids = obs_joinids[idx : idx + soma_chunk]
-        tbl = next(X.read(coords=(chunk_obs_ids, var_slice)).tables())
-        n = len(tbl)
-        log(f"read_table: {n}")
-        total_read += n
-    log(f"read_table total: {total_read}")
-    return total_read
 
+COORD_ORDERS = ['as-is', 'sorted']
 
-def read_blockwise_table(X, obs_joinids, soma_chunk, var_slice, log):
-    total_read = 0
-    for idx in range(0, len(obs_joinids), soma_chunk):
-        chunk_obs_ids = obs_joinids[idx : idx + soma_chunk]
-        tbl, _ = next(
-            X.read(coords=(chunk_obs_ids, var_slice))
-            .blockwise(axis=0, size=len(chunk_obs_ids), eager=False)
-            .tables()
-        )
-        n = len(tbl)
-        log(f"read_blockwise_table: {n}")
-        total_read += n
-    log(f"read_blockwise_table total: {total_read}")
-    return total_read
 
+def sort_coords(chunk_obs_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """``chunk_obs_ids`` in ascending order, and the permutation ``perm`` that sorts them
+    (``sorted = chunk_obs_ids[perm]``)."""
+    perm = np.argsort(chunk_obs_ids, kind='stable')
+    return chunk_obs_ids[perm], perm
 
-def read_blockwise_scipy_coo(X, obs_joinids, soma_chunk, var_slice, log):
-    total_read = 0
-    for idx in range(0, len(obs_joinids), soma_chunk):
-        chunk_obs_ids = obs_joinids[idx : idx + soma_chunk]
-        coo, _ = next(
-            X.read(coords=(chunk_obs_ids, var_slice))
-            .blockwise(axis=0, size=len(chunk_obs_ids), eager=False)
-            .scipy(compress=False)
-        )
-        arr_str = repr(coo).replace('\n', '')
-        log(f"read_blockwise_scipy_coo: {arr_str}")
-        total_read += coo.nnz
-    log(f"read_blockwise_scipy_coo total: {total_read}")
-    return total_read
+
+def invert(perm: np.ndarray) -> np.ndarray:
+    inv = np.empty_like(perm)
+    inv[perm] = np.arange(len(perm))
+    return inv
+
+
+class ChunkRead(NamedTuple):
+    # Number of elements read
+    n: int
+    # Description, for -v/--verbose logging
+    desc: str
+    # Time spent restoring the requested row order (see `read_chunk`)
+    restore_ns: int = 0
+    # Time spent converting the Arrow COO table (see `benchmarks.coo_kernels`)
+    kernel_ns: int = 0
+
+
+# Each reads (and converts) one chunk. If ``perm`` is given, ``coords`` are ``chunk_obs_ids[perm]`` (e.g. sorted), and
+# results are put back in ``chunk_obs_ids`` order. ``bufs`` holds (thread-local) buffers reused across chunks.
+
+def read_table(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    # Rows are identified by joinid (and returned in storage order either way); nothing to restore
+    tbl = next(X.read(coords=(coords, var_slice)).tables())
+    n = len(tbl)
+    return ChunkRead(n, str(n))
+
+
+def read_blockwise_table(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    tbl, _ = next(
+        X.read(coords=(coords, var_slice))
+        .blockwise(axis=0, size=len(coords), eager=False)
+        .tables()
+    )
+    restore_ns = 0
+    if perm is not None:
+        # `soma_dim_0` holds positions in `coords`; map them to positions in the requested (unsorted) chunk
+        t = time.perf_counter_ns()
+        idx = tbl.schema.get_field_index('soma_dim_0')
+        tbl = tbl.set_column(idx, 'soma_dim_0', pa.array(perm[tbl.column(idx).to_numpy()]))
+        restore_ns = time.perf_counter_ns() - t
+    n = len(tbl)
+    return ChunkRead(n, str(n), restore_ns=restore_ns)
+
+
+def read_blockwise_scipy_coo(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    coo, _ = next(
+        X.read(coords=(coords, var_slice))
+        .blockwise(axis=0, size=len(coords), eager=False)
+        .scipy(compress=False)
+    )
+    restore_ns = 0
+    if perm is not None:
+        t = time.perf_counter_ns()
+        coo.row = perm[coo.row]
+        restore_ns = time.perf_counter_ns() - t
+    return ChunkRead(coo.nnz, repr(coo).replace('\n', ''), restore_ns=restore_ns)
+
+
+def read_blockwise_scipy_csr(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    csr, _ = next(
+        X.read(coords=(coords, var_slice))
+        .blockwise(axis=0, size=len(coords), eager=False)
+        .scipy(compress=True)
+    )
+    restore_ns = 0
+    if perm is not None:
+        t = time.perf_counter_ns()
+        csr = csr[invert(perm)]
+        restore_ns = time.perf_counter_ns() - t
+    return ChunkRead(csr.nnz, repr(csr).replace('\n', ''), restore_ns=restore_ns)
+
+
+def coo_arrays(tbl, var_slice) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(obs joinids, var offsets within ``var_slice``, values) of an Arrow COO table."""
+    cols = tbl.column('soma_dim_1').to_numpy()
+    if var_slice.start:
+        cols = cols - var_slice.start
+    return tbl.column('soma_dim_0').to_numpy(), cols, tbl.column('soma_data').to_numpy()
+
+
+def n_cols(var_slice) -> int:
+    # SOMA slices are inclusive
+    return var_slice.stop - (var_slice.start or 0) + 1
 
 
-def read_blockwise_scipy_csr(X, obs_joinids, soma_chunk, var_slice, log):
+# The following read the chunk's full Arrow COO table (concatenating partial results, when it exceeds the read buffers),
+# and time its conversion separately (as `kernel_ns`). Row reindexing takes `perm` into account, so restoring the
+# requested row order is free.
+
+def read_table_dense_searchsorted(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    tbl = X.read(coords=(coords, var_slice)).tables().concat()
+    t = time.perf_counter_ns()
+    joinids, cols, data = coo_arrays(tbl, var_slice)
+    rows = searchsorted_rows(coords, joinids, perm)
+    dense = scatter_dense(bufs, rows, cols, data, len(coords), n_cols(var_slice))
+    kernel_ns = time.perf_counter_ns() - t
+    return ChunkRead(len(tbl), f'dense {dense.shape}', kernel_ns=kernel_ns)
+
+
+def read_table_dense_lut(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    tbl = X.read(coords=(coords, var_slice)).tables().concat()
+    t = time.perf_counter_ns()
+    joinids, cols, data = coo_arrays(tbl, var_slice)
+    rows = lut_rows(bufs, coords, joinids, perm)
+    dense = scatter_dense(bufs, rows, cols, data, len(coords), n_cols(var_slice))
+    kernel_ns = time.perf_counter_ns() - t
+    return ChunkRead(len(tbl), f'dense {dense.shape}', kernel_ns=kernel_ns)
+
+
+def read_table_csr_lut(X, coords, var_slice, perm=None, bufs=None) -> ChunkRead:
+    tbl = X.read(coords=(coords, var_slice)).tables().concat()
+    t = time.perf_counter_ns()
+    joinids, cols, data = coo_arrays(tbl, var_slice)
+    rows = lut_rows(bufs, coords, joinids, perm)
+    csr = coo_to_csr(rows, cols, data, len(coords), n_cols(var_slice))
+    kernel_ns = time.perf_counter_ns() - t
+    return ChunkRead(csr.nnz, repr(csr).replace('\n', ''), kernel_ns=kernel_ns)
+
+
+READ_METHODS = [
+    read_table,
+    read_blockwise_table,
+    read_blockwise_scipy_coo,
+    read_blockwise_scipy_csr,
+    read_table_dense_searchsorted,
+    read_table_dense_lut,
+    read_table_csr_lut,
+]
+# Dense methods allocate a `chunk_size` × `n_vars` buffer per thread (e.g. 800MB at the defaults), so only run when
+# requested (via -f/--method)
+DENSE_METHODS = [read_table_dense_searchsorted, read_table_dense_lut]
+DEFAULT_READ_METHODS = [ fn for fn in READ_METHODS if fn not in DENSE_METHODS ]
+
+
+def parse_methods(ctx, param, value) -> list:
+    """Comma-separated read method names (unique prefixes accepted); default: all but ``DENSE_METHODS``."""
+    if not value:
+        return DEFAULT_READ_METHODS
+    methods = []
+    for s in value.split(','):
+        matches = [ fn for fn in READ_METHODS if fn.__name__ == s ] or [ fn for fn in READ_METHODS if fn.__name__.startswith(s) ]
+        if len(matches) != 1:
+            raise click.BadParameter(f"Unrecognized or ambiguous read method: {s}")
+        methods.append(matches[0])
+    return methods
+
+
+def read_chunk(fn, X, chunk_obs_ids, var_slice, coord_order: str = 'as-is', bufs: Optional[Buffers] = None) -> ChunkRead:
+    if coord_order == 'sorted':
+        coords, perm = sort_coords(chunk_obs_ids)
+        return fn(X, coords, var_slice, perm=perm, bufs=bufs)
+    elif coord_order == 'as-is':
+        return fn(X, chunk_obs_ids, var_slice, bufs=bufs)
+    raise ValueError(f"Unrecognized coord order: {coord_order} (options: {', '.join(COORD_ORDERS)})")
+
+
+def iter_chunks(fn, X, obs_joinids, soma_chunk, var_slice, lookahead: int = 0, coord_order: str = 'as-is') -> Iterator[ChunkRead]:
+    """Apply ``fn`` to each ``soma_chunk``-sized chunk of ``obs_joinids``, yielding results in order.
+
+    ``lookahead == 0`` reads chunks serially; otherwise, up to ``lookahead`` chunk reads (and conversions) are kept in
+    flight on a thread pool, while the caller consumes earlier chunks. ``coord_order="sorted"`` sorts each chunk's
+    joinids before reading it (see ``read_chunk``). Conversion buffers are reused across chunks (per thread).
+    """
+    bufs = Buffers()
+    chunks = ( obs_joinids[idx : idx + soma_chunk] for idx in range(0, len(obs_joinids), soma_chunk) )
+    if not lookahead:
+        for chunk_obs_ids in chunks:
+            yield read_chunk(fn, X, chunk_obs_ids, var_slice, coord_order, bufs)
+        return
+    with ThreadPoolExecutor(max_workers=lookahead) as executor:
+        futures = deque()
+        for chunk_obs_ids in chunks:
+            futures.append(executor.submit(read_chunk, fn, X, chunk_obs_ids, var_slice, coord_order, bufs))
+            if len(futures) > lookahead:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def read_all(fn, X, obs_joinids, soma_chunk, var_slice, log, lookahead: int = 0, coord_order: str = 'as-is') -> tuple[int, float, float]:
+    """Read all chunks; returns (number of elements read, seconds spent restoring row order, seconds spent in
+    conversion kernels)."""
+    name = fn.__name__
     total_read = 0
-    for idx in range(0, len(obs_joinids), soma_chunk):
-        chunk_obs_ids = obs_joinids[idx : idx + soma_chunk]
-        csr, _ = next(
-            X.read(coords=(chunk_obs_ids, var_slice))
-            .blockwise(axis=0, size=len(chunk_obs_ids), eager=False)
-            .scipy(compress=True)
-        )
-        arr_str = repr(csr).replace('\n', '')
-        log(f"read_blockwise_scipy_csr: {arr_str}")
-        total_read += csr.nnz
-    log(f"read_blockwise_scipy_csr total: {total_read}")
-    return total_read
+    restore_ns = 0
+    kernel_ns = 0
+    for chunk in iter_chunks(fn, X, obs_joinids, soma_chunk, var_slice, lookahead=lookahead, coord_order=coord_order):
+        log(f"{name}: {chunk.desc}")
+        total_read += chunk.n
+        restore_ns += chunk.restore_ns
+        kernel_ns += chunk.kernel_ns
+    log(f"{name} total: {total_read}")
+    return total_read, restore_ns / 1e9, kernel_ns / 1e9
 
 
 @cli.command('read-chunks')
-@click.option('-c', '--soma-chunk-size', default=10_000, type=int)
+@click.option('-c', '--soma-chunk-size', 'chunk_sizes', callback=sweep_arg(int, default=[10_000]), help='Chunk size(s) to test (sweep spec, e.g. "1024..131072:x2"); default: 10000')
+@click.option('-d', '--db-path', default=DEFAULT_PQT_PATH, help=f'Append a row for each (method, chunk size, shuffle, …, rep) run to this Parquet dataset (directory), with `elapsed`, `nnz_per_sec`, and `cells_per_sec`; defaults to {DEFAULT_PQT_PATH}, pass "" to disable')
+@click.option('-f', '--method', 'methods', callback=parse_methods, help=f'Comma-separated read methods to run (unique prefixes accepted); options: [{", ".join(fn.__name__ for fn in READ_METHODS)}], default is all but the `read_table_dense_*` methods (which allocate a chunk_size × n_vars buffer per thread). The `read_table_dense_*` / `read_table_csr_*` methods convert the Arrow COO table directly (see `benchmarks.coo_kernels`), reporting kernel time (and ns/nnz) separately from read time')
+@click.option('-k', '--lookahead', 'lookaheads', callback=sweep_arg(int, default=[0]), help='Keep this many chunk reads (and conversions) in flight on a thread pool, while earlier chunks are consumed (sweep spec, e.g. "0,1..16"); 0 ⇒ serial (default). Throughput is reported for each value, relative to serial')
+@tiledb_stats_flag
+@click.option('-m', '--shuffle-mode', 'shuffles', callback=sweep_arg(Shuffle.parse), help=f'Comma-separated shuffle strategies to benchmark; options: [{", ".join(SHUFFLE_MODES)}] ("runs:<R>": shuffle contiguous runs of R rows; "window[:<W>]": shuffle tile-aligned windows of W rows (default: the obs tile extent), then within them; "dataset": shuffle within datasets); overrides -s/--shuffle')
+@click.option('-M', '--metadata', multiple=True, help='<key>=<value> pairs to attach to each row persisted to -d/--db-path')
+@click.option('-n', '--reps', default=1, type=int, help='Run each configuration this many times; default: 1')
+@click.option('-o', '--coord-order', 'coord_orders', callback=sweep_arg(str, default=['as-is']), help=f'Order of each chunk\'s joinids passed to `X.read` (comma-separated, to compare); options: [{", ".join(COORD_ORDERS)}] (default: as-is). "sorted" reads each chunk in ascending joinid order (which TileDB coalesces into contiguous ranges), then restores the requested row order with an inverse permutation; the restore time is reported separately')
 @click.option('-P', '--py-buffer-size', default=1024**3, type=int)
 @click.option('-r', '--rng-seed', type=int)
-@click.option('-s', '--shuffle', count=True, help='1x: chunk shuffle, 2x: global shuffle')
+@click.option('-s', '--shuffle', count=True, help='1x: chunk shuffle, 2x: global shuffle (equivalent to -m chunk / -m global)')
 @click.option('-S', '--soma-buffer-size', default=1024**3, type=int)
+@tiledb_config_opt
+@profile_opt
+@click.option('-W', '--profile-dir', default=DEFAULT_PROFILE_DIR, help=f'With -U/--profile: write each read method\'s profile to this directory; defaults to {DEFAULT_PROFILE_DIR}')
 @click.option('-v', '--verbose', is_flag=True, help='Print stats about each chunk read to stderr')
 @click.option('-V', '--n_vars', default=20_000, type=int)
 @click.argument('uri')  # e.g. `data/census-benchmark_2:3`; `alb download -s2 -e3
-def read_chunks(soma_chunk_size, py_buffer_size, rng_seed, shuffle, soma_buffer_size, n_vars, verbose, uri):
-    """Benchmark TileDB-SOMA "chunk" reads, generating various matrix formats, and optionally shuffling data."""
+def read_chunks(chunk_sizes, methods, db_path, lookaheads, tiledb_stats, shuffles, metadata, reps, coord_orders, py_buffer_size, rng_seed, shuffle, soma_buffer_size, tiledb_configs, profile_format, profile_dir, n_vars, verbose, uri):
+    """Benchmark TileDB-SOMA "chunk" reads, generating various matrix formats, and optionally shuffling data.
+
+    Each point in the cartesian product of -T/--tiledb-config values is benchmarked (with its own `SOMATileDBContext`),
+    with each -c/--soma-chunk-size, -m/--shuffle-mode, -k/--lookahead, and -o/--coord-order value, -n/--reps times.
+    Each shuffle's locality is reported as the mean number of obs-dimension tiles each chunk touches;
+    -L/--tiledb-stats reports the bytes and tiles actually read.
+    """
+    if shuffles and shuffle:
+        raise click.UsageError("Pass at most one of -m/--shuffle-mode, -s/--shuffle")
+    for coord_order in coord_orders:
+        if coord_order not in COORD_ORDERS:
+            raise click.BadParameter(f"Invalid value: {coord_order}", param_hint='-o/--coord-order')
+    if not shuffles:
+        shuffles = [ Shuffle(['none', 'chunk', 'global'][min(shuffle, 2)]) ]
+    run_metadata = dict(
+        run_id=uuid4().hex,
+        hostname=gethostname(),
+        instance_type=ec2_instance_type(),
+        uri=uri,
+        n_vars=n_vars,
+        rng_seed=rng_seed,
+        py_buffer_size=py_buffer_size,
+        soma_buffer_size=soma_buffer_size,
+    )
+    for m in metadata:
+        if '=' not in m:
+            raise click.BadParameter(f"Expected <key>=<value>: {m}", param_hint='-M/--metadata')
+        k, v = m.split('=', 1)
+        if k in run_metadata or k in RESULT_COLS or k.startswith(TDB_PREFIX) or k.startswith(TILEDB_PREFIX):
+            raise click.BadParameter(f"Key {k} is reserved (recorded by `alb read-chunks`)", param_hint='-M/--metadata')
+        run_metadata[k] = v
     var_slice = slice(0, n_vars - 1)
+    column_names = ['soma_joinid']
+    if any(s.mode == 'dataset' for s in shuffles):
+        column_names.append('dataset_id')
     with soma.open(f'{uri}/obs') as obs:
-        df = obs.read(column_names=['soma_joinid']).concat().to_pandas()
-    obs_joinids = df.soma_joinid.to_numpy()
+        df = obs.read(column_names=column_names).concat().to_pandas()
+    with soma.open(f'{uri}/ms/RNA/X/raw') as X:
+        tile_extent = obs_tile_extent(X)
 
-    if shuffle == 1:
-        for idx in range(0, len(obs_joinids), soma_chunk_size):
-            np.random.default_rng(seed=rng_seed).shuffle(obs_joinids[idx: idx + soma_chunk_size])
-    elif shuffle == 2:
-        np.random.default_rng(seed=rng_seed).shuffle(obs_joinids)
-
-    tiledb_config = {
-        "py.init_buffer_bytes": py_buffer_size,
-        "soma.init_buffer_bytes": soma_buffer_size,
-    }
+    # Shuffled joinids, and their locality (obs tiles touched per chunk), for each (chunk size, shuffle)
+    rng = np.random.default_rng(seed=rng_seed)
+    orders = {}
+    for chunk_size, s in product(chunk_sizes, shuffles):
+        obs_joinids = shuffle_joinids(
+            df.soma_joinid.to_numpy(),
+            s,
+            chunk_size=chunk_size,
+            rng=rng,
+            dataset_ids=df.dataset_id.to_numpy() if 'dataset_id' in df else None,
+            tile_extent=tile_extent,
+        )
+        tiles = tiles_per_chunk(obs_joinids, chunk_size, tile_extent) if tile_extent else None
+        if tiles is not None:
+            print(f"Shuffle {s}, chunk size {chunk_size}: {tiles:.1f} obs tiles (of {tile_extent} rows) per chunk")
+        orders[(chunk_size, s)] = (obs_joinids, tiles)
 
     if verbose:
         log = err
     else:
         log = silent
 
-    context = soma.SOMATileDBContext(tiledb_config=tiledb_config)
+    points = expand(tiledb_config_axes(tiledb_configs))
     total_read = None
-    with soma.open(f'{uri}/ms/RNA/X/raw', context=context) as X:
-        for fn in [
-            read_table,
-            read_blockwise_table,
-            read_blockwise_scipy_coo,
-            read_blockwise_scipy_csr,
-        ]:
-            name = fn.__name__
-            t = time.perf_counter()
-            total = fn(X, obs_joinids, soma_chunk=soma_chunk_size, var_slice=var_slice, log=log)
-            if total_read is not None and total != total_read:
-                raise ValueError(f"{name} didn't read expected/previous number of elems: {total} != {total_read}")
-            total_read = total
-            print(f"{name} elapsed: {time.perf_counter() - t:.2f}s")
+    for point in points:
+        tiledb_config = {
+            "py.init_buffer_bytes": py_buffer_size,
+            "soma.init_buffer_bytes": soma_buffer_size,
+            **point_tiledb_config(point),
+        }
+        context = soma.SOMATileDBContext(tiledb_config=tiledb_config)
+        with soma.open(f'{uri}/ms/RNA/X/raw', context=context) as X:
+            effective_config = effective_tiledb_config(X.context, tiledb_config)
+            if point:
+                print(f"TileDB config: {effective_config}")
+            for (chunk_size, s), rep, fn in product(orders, range(reps), methods):
+                obs_joinids, tiles = orders[(chunk_size, s)]
+                # (lookahead, coord order) → elapsed, for reporting speedups vs. serial / as-is coord order
+                elapsed_by = {}
+                for lookahead, coord_order in product(lookaheads, coord_orders):
+                    tags = []
+                    if len(chunk_sizes) > 1:
+                        tags.append(f'chunk_size={chunk_size}')
+                    if len(shuffles) > 1:
+                        tags.append(f'shuffle={s}')
+                    if reps > 1:
+                        tags.append(f'rep={rep}')
+                    if lookahead:
+                        tags.append(f'lookahead={lookahead}')
+                    if coord_order != 'as-is':
+                        tags.append(f'coords={coord_order}')
+                    name = f"{fn.__name__}[{', '.join(tags)}]" if tags else fn.__name__
+                    stats = TiledbStats() if tiledb_stats else None
+                    profiler = None
+                    if profile_format:
+                        profiler = Profiler(join(profile_dir, f'{fn.__name__}-{uuid4().hex}.{PROFILE_FORMATS[profile_format]}'), fmt=profile_format)
+                    start_dt = pd.Timestamp.now()
+                    with profiler or nullcontext(), stats or nullcontext():
+                        t = time.perf_counter()
+                        total, restore_s, kernel_s = read_all(fn, X, obs_joinids, soma_chunk=chunk_size, var_slice=var_slice, log=log, lookahead=lookahead, coord_order=coord_order)
+                        elapsed = time.perf_counter() - t
+                    if total_read is not None and total != total_read:
+                        raise ValueError(f"{name} didn't read expected/previous number of elems: {total} != {total_read}")
+                    total_read = total
+                    elapsed_by[(lookahead, coord_order)] = elapsed
+                    extras = []
+                    if lookahead and (0, coord_order) in elapsed_by:
+                        extras.append(f"{elapsed_by[(0, coord_order)] / elapsed:.2f}x serial")
+                    if coord_order != 'as-is':
+                        if (lookahead, 'as-is') in elapsed_by:
+                            extras.append(f"{elapsed_by[(lookahead, 'as-is')] / elapsed:.2f}x as-is")
+                        extras.append(f"restoring order: {restore_s:.2f}s")
+                    if kernel_s and total:
+                        extras.append(f"kernel: {kernel_s:.2f}s, {1e9 * kernel_s / total:.1f}ns/nnz")
+                    extras = ''.join(f', {e}' for e in extras)
+                    print(f"{name} elapsed: {elapsed:.2f}s ({total / elapsed / 1e6:.2f}M elems/s{extras})")
+                    record = dict(
+                        **run_metadata,
+                        start_dt=start_dt,
+                        method=fn.__name__,
+                        chunk_size=chunk_size,
+                        shuffle=str(s),
+                        tiles_per_chunk=tiles,
+                        lookahead=lookahead,
+                        coord_order=coord_order,
+                        rep=rep,
+                        # `tiledb.<key>` columns, as in `alb data-loader`'s DB
+                        **point,
+                        tiledb_config=effective_config,
+                        n_cells=len(obs_joinids),
+                        nnz=total,
+                        elapsed=elapsed,
+                        restore_s=restore_s,
+                        kernel_s=kernel_s,
+                        kernel_ns_per_nnz=1e9 * kernel_s / total if total else None,
+                        nnz_per_sec=total / elapsed,
+                        cells_per_sec=len(obs_joinids) / elapsed,
+                    )
+                    if stats:
+                        print(f"{name} TileDB stats: {stats.describe()}")
+                        record.update(stats.summary())
+                    if profiler:
+                        record['profile_path'] = profiler.path
+                        print_top(profiler, name=name)
+                    if db_path:
+                        # Persist each row as it completes, so that a crash / Ctrl-C doesn't lose earlier ones
+                        append_df(db_path, pd.DataFrame([record]), name='read-chunks result')
@@ -0,0 +1,45 @@
+from click import argument, option
+from utz import err
+
+from benchmarks.cli.base import cli
+from benchmarks.s3_emulator import DEFAULT_BUCKET, DEFAULT_PORT, serve
+from benchmarks.sweep import parse_size
+
+
+@cli.command('s3-serve')
+@option('-b', '--bucket', default=DEFAULT_BUCKET, help=f'Bucket name to serve ROOT as; default: {DEFAULT_BUCKET}')
+@option('-B', '--bandwidth', callback=lambda ctx, param, value: parse_size(value), help='Cap aggregate bandwidth (over all connections) at this many bytes/sec, e.g. "100M"')
+@option('-H', '--host', default='localhost', help='Address to bind; default: localhost')
+@option('-l', '--latency-ms', default=0., type=float, help='Delay each response (time to first byte) by this many milliseconds')
+@option('-p', '--port', default=DEFAULT_PORT, type=int, help=f'Port to listen on; default: {DEFAULT_PORT}')
+@option('-r', '--request-rate', type=float, help='Max requests/sec (token bucket, with a burst of one second\'s worth); excess requests get "503 SlowDown"')
+@option('-v', '--verbose', is_flag=True, help='Log each request to stderr')
+@argument('root')
+def s3_serve(bucket, bandwidth, host, latency_ms, port, request_rate, verbose, root):
+    """Serve ROOT (e.g. a local SOMA experiment's parent directory) read-only over a local S3-compatible endpoint,
+    with optional injected latency, bandwidth cap, and request-rate throttling.
+
+    Point `alb data-loader` at it with -Z/--s3-endpoint, e.g.:
+
+        alb s3-serve -l20 -B200M data &
+        alb data-loader -Z localhost:9000 s3://local/census-benchmark_2:4
+    """
+    server, stats = serve(
+        root,
+        bucket=bucket,
+        host=host,
+        port=port,
+        latency=latency_ms / 1e3,
+        bandwidth=bandwidth,
+        request_rate=request_rate,
+        verbose=verbose,
+    )
+    endpoint = f'{host}:{server.server_address[1]}'
+    err(f"Serving {root} as s3://{bucket}/ at http://{endpoint} (latency {latency_ms}ms, bandwidth {bandwidth or '∞'} B/s, request rate {request_rate or '∞'}/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        err(f"Served {stats}")
@@ -0,0 +1,61 @@
+"""Simulated "training step" consumers, for measuring how much of a loader's latency its prefetching hides.
+
+``benchmark`` normally pulls batches as fast as possible; with a ``Consumer``, each batch is followed by ``ms``
+milliseconds of simulated model compute, and each batch's time is split into data wait (blocked in ``next()``,
+``Batches.elapsed_ns``) and step time (``Batches.step_ns``). A config "keeps the trainer fed" if its data wait is ~0.
+
+Consumer profiles (``alb data-loader --consumer-profile``):
+- ``sleep``: idle (GIL released, CPU free), like a training step running on a GPU
+- ``numpy``: repeated NumPy matmuls (CPU busy, GIL mostly released), like a multi-threaded CPU training step
+- ``spin``: a pure-Python busy loop (CPU busy, GIL held), the worst case for prefetch threads in the main process
+"""
+from time import perf_counter_ns, sleep
+from typing import Optional
+
+import numpy as np
+
+CONSUMER_PROFILES = ['sleep', 'numpy', 'spin']
+# Side length of the matrices multiplied by the "numpy" profile (each matmul takes ~0.1ms on a modern core)
+MATMUL_SIZE = 64
+
+
+class Consumer:
+    """Simulate a ``ms``-millisecond training step per batch, per ``profile``."""
+    def __init__(self, ms: float, profile: str = 'sleep'):
+        if profile not in CONSUMER_PROFILES:
+            raise ValueError(f"Unrecognized consumer profile: {profile} (options: {', '.join(CONSUMER_PROFILES)})")
+        self.ms = ms
+        self.profile = profile
+        self.ns = int(ms * 1e6)
+        if profile == 'numpy':
+            rng = np.random.default_rng(0)
+            self.a = rng.random((MATMUL_SIZE, MATMUL_SIZE), dtype=np.float32)
+            self.b = rng.random((MATMUL_SIZE, MATMUL_SIZE), dtype=np.float32)
+
+    def step(self, X=None):
+        """Consume one batch (``X`` is unused; the simulated step's cost doesn't depend on it)."""
+        if self.profile == 'sleep':
+            sleep(self.ms / 1e3)
+            return
+        end = perf_counter_ns() + self.ns
+        if self.profile == 'numpy':
+            a, b = self.a, self.b
+            while perf_counter_ns() < end:
+                np.matmul(a, b)
+        else:
+            while perf_counter_ns() < end:
+                pass
+
+
+def consumer_summary(elapsed_ns: np.ndarray, step_ns: np.ndarray, elapsed: float) -> dict:
+    """Epoch totals of per-batch data wait and step time, and the fraction of the epoch spent waiting for data."""
+    data_wait_s = elapsed_ns.sum() / 1e9
+    return dict(
+        data_wait_s=data_wait_s,
+        step_s=step_ns.sum() / 1e9,
+        data_wait_frac=data_wait_s / elapsed if elapsed else None,
+    )
+
+
+def make_consumer(ms: Optional[float], profile: str = 'sleep') -> Optional[Consumer]:
+    return Consumer(ms, profile) if ms else None
@@ -0,0 +1,80 @@
+"""Vectorized COO (``soma_dim_0``, ``soma_dim_1``, ``soma_data``) → dense / CSR conversion kernels, for one chunk.
+
+Rows are reindexed from obs joinids to positions in the requested chunk (``coords``) either by ``np.searchsorted`` over
+the sorted coords, or via a joinid-indexed lookup table. Dense output is scattered (by flat index) into a buffer that's
+reused across chunks: it's only reallocated when it's too small, and is cleared by zeroing the previous chunk's
+nonzeros, rather than a full memset. SOMA sparse arrays don't allow duplicate coordinates, so scattering by assignment
+is equivalent to (and much faster than) ``np.add.at``.
+
+Buffers live on a (thread-local) ``Buffers`` object, so that concurrent chunk reads don't share them.
+"""
+from threading import local
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class Buffers(local):
+    """Reusable per-thread state: a dense output buffer (and the flat indices last written to it), and a joinid →
+    row lookup table."""
+    dense: Optional[np.ndarray] = None
+    flat_idx: Optional[np.ndarray] = None
+    lut: Optional[np.ndarray] = None
+
+
+def searchsorted_rows(coords: np.ndarray, joinids: np.ndarray, perm: Optional[np.ndarray] = None) -> np.ndarray:
+    """Position of each of ``joinids`` in ``coords``.
+
+    If ``perm`` is given, ``coords`` are already sorted, as ``chunk_obs_ids[perm]``, and positions are in
+    ``chunk_obs_ids`` (restoring the requested order for free)."""
+    if perm is None:
+        perm = np.argsort(coords, kind='stable')
+        coords = coords[perm]
+    return perm[np.searchsorted(coords, joinids)]
+
+
+def lut_rows(bufs: Buffers, coords: np.ndarray, joinids: np.ndarray, perm: Optional[np.ndarray] = None) -> np.ndarray:
+    """Position of each of ``joinids`` in ``coords`` (or in ``chunk_obs_ids``, if ``perm`` is given; see
+    ``searchsorted_rows``), via a joinid-indexed lookup table.
+
+    The table is only grown (never cleared): entries for joinids outside the current chunk are stale, but never read.
+    """
+    lut = bufs.lut
+    max_joinid = int(coords.max()) if len(coords) else 0
+    if lut is None or len(lut) <= max_joinid:
+        lut = bufs.lut = np.empty(max_joinid + 1, dtype=np.int64)
+    lut[coords] = perm if perm is not None else np.arange(len(coords))
+    return lut[joinids]
+
+
+def scatter_dense(
+        bufs: Buffers,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        data: np.ndarray,
+        n_rows: int,
+        n_cols: int,
+) -> np.ndarray:
+    """``n_rows`` × ``n_cols`` dense block with ``data`` at (``rows``, ``cols``), backed by ``bufs.dense`` (so it's only
+    valid until the next call, on the same thread)."""
+    buf = bufs.dense
+    if buf is None or buf.shape[0] < n_rows or buf.shape[1] != n_cols or buf.dtype != data.dtype:
+        buf = bufs.dense = np.zeros((n_rows, n_cols), dtype=data.dtype)
+        bufs.flat_idx = None
+    flat = buf.reshape(-1)
+    if bufs.flat_idx is not None:
+        flat[bufs.flat_idx] = 0
+    flat_idx = rows * n_cols + cols
+    flat[flat_idx] = data
+    bufs.flat_idx = flat_idx
+    return buf[:n_rows]
+
+
+def coo_to_csr(rows: np.ndarray, cols: np.ndarray, data: np.ndarray, n_rows: int, n_cols: int) -> sp.csr_matrix:
+    """CSR matrix from (row-reindexed) COO arrays, via a stable argsort on rows (preserving column order within each
+    row) and a ``bincount``-based ``indptr``."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return sp.csr_matrix((data[order], cols[order], indptr), shape=(n_rows, n_cols))
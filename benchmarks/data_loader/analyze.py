@@ -0,0 +1,179 @@
+"""Tail-latency and periodicity analysis of per-batch timings (as persisted to the batches DB by ``alb data-loader``).
+
+For each epoch, computes:
+- latency quantiles (a summary of the batch-latency CDF), and the share of total time spent in the slowest 10% / 1%
+  of batches
+- periodicity: the dominant period of the batch-latency series (from its FFT power spectrum), and the lag (and
+  height) of its highest autocorrelation peak. Periodic stalls (a slow batch every N) have a "comb" spectrum, with
+  (nearly) equal power at every harmonic k/N, so the FFT period is the fundamental: the lowest frequency with at least
+  ``HARMONIC_FRAC`` of the peak power that is also (nearly) an autocorrelation peak
+- alignment of slow batches with forced ``gc.collect()``s (every ``gc_freq`` batches) and with shuffle-block
+  boundaries (every ``block_size / batch_size`` batches), as a "lift": how over-represented aligned batches are among
+  the slowest 10%, relative to all batches (1 ⇒ no association). Each lift excludes batches aligned with the other,
+  so that e.g. ``gc_freq`` dividing the block size doesn't conflate the two.
+
+Batch latency here includes any forced ``gc.collect()`` that followed the batch.
+"""
+from math import ceil
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+QUANTILES = { 'p50': .5, 'p90': .9, 'p99': .99, 'p999': .999 }
+TAIL_FRACS = { 'tail10_share': .1, 'tail1_share': .01 }
+# Epoch-record columns used by the analysis
+EPOCH_COLS = ['batch_size', 'gc_freq', 'block_size', 'exclude_first_batch']
+# Slowest fraction of batches considered "slow", for alignment lifts
+SLOW_FRAC = .1
+# Lifts at or above this attribute stalls to GC / block fetches
+LIFT_THRESHOLD = 2
+# Spectral bins with at least this fraction of the peak power are candidate fundamentals (see `fft_period`)
+HARMONIC_FRAC = .5
+# Candidate fundamentals' autocorrelation must be at least this fraction of the highest autocorrelation peak
+ACF_FRAC = .5
+# Shortest period considered (batches)
+MIN_PERIOD = 2
+
+
+def tail_share(x: np.ndarray, frac: float) -> float:
+    """Fraction of ``x``'s total accounted for by its largest ``frac`` of elements."""
+    k = max(1, ceil(frac * len(x)))
+    return float(np.sort(x)[-k:].sum() / x.sum())
+
+
+def fft_period(freqs: np.ndarray, power: np.ndarray, acf: np.ndarray, acf_period: Optional[int]) -> Optional[float]:
+    """Fundamental period of a power spectrum: the lowest frequency with at least ``HARMONIC_FRAC`` of the peak power,
+    whose period is also an autocorrelation peak (at least ``ACF_FRAC`` of the highest one); if none is, the spectral
+    bin nearest ``acf_period``."""
+    if not len(freqs):
+        return None
+    n = len(acf)
+    acf_peak = acf[acf_period] if acf_period else None
+    for idx in np.flatnonzero(power >= HARMONIC_FRAC * power.max()):
+        period = 1 / freqs[idx]
+        lag = min(int(round(period)), n - 1)
+        if acf_peak is None or acf[lag] >= ACF_FRAC * acf_peak:
+            return float(period)
+    return float(1 / freqs[np.argmin(np.abs(1 / freqs - acf_period))])
+
+
+def periodicity(x: np.ndarray) -> dict:
+    """Dominant period of ``x`` (the fundamental of its FFT power spectrum), and its highest autocorrelation peak (lag
+    and value).
+
+    Only periods with at least 4 cycles in ``x`` (and of at least ``MIN_PERIOD``) are considered.
+    """
+    n = len(x)
+    rv = dict(fft_period=None, acf_period=None, acf_peak=None)
+    x = x - x.mean()
+    if n < 16 or not x.any():
+        return rv
+    # Autocorrelation via Wiener–Khinchin (zero-padded to avoid circular wraparound)
+    f = np.fft.rfft(x, 2 * n)
+    acf = np.fft.irfft(np.abs(f) ** 2)[:n]
+    acf /= acf[0]
+    lags = np.arange(MIN_PERIOD, n // 4 + 1)
+    if len(lags):
+        lag = int(lags[np.argmax(acf[lags])])
+        rv.update(acf_period=lag, acf_peak=float(acf[lag]))
+    power = np.abs(np.fft.rfft(x)) ** 2
+    freqs = np.fft.rfftfreq(n)
+    valid = (freqs >= 4 / n) & (freqs <= 1 / MIN_PERIOD)
+    rv['fft_period'] = fft_period(freqs[valid], power[valid], acf, rv['acf_period'])
+    return rv
+
+
+def lift(slow: np.ndarray, aligned: np.ndarray) -> Optional[float]:
+    """P(aligned | slow) / P(aligned); ``None`` if undefined, or if (nearly) every batch is aligned."""
+    base = aligned.mean() if len(aligned) else 0
+    if not 0 < base < .5 or not slow.any():
+        return None
+    return float((aligned & slow).sum() / slow.sum() / base)
+
+
+def gc_aligned(batch: np.ndarray, gc_freq: Optional[int]) -> np.ndarray:
+    if not gc_freq:
+        return np.zeros(len(batch), dtype=bool)
+    return batch % gc_freq == 0
+
+
+def block_aligned(batch: np.ndarray, batch_size: Optional[int], block_size: Optional[int], offset: int = 1) -> np.ndarray:
+    """Batches that start a new shuffle block, or straddle two.
+
+    ``offset`` is the number of batches read before ``batch`` 0 (1, by default, for the excluded first batch).
+    """
+    if not batch_size or not block_size:
+        return np.zeros(len(batch), dtype=bool)
+    start = (batch + offset) * batch_size
+    end = start + batch_size
+    return (start % block_size == 0) | (start // block_size != (end - 1) // block_size)
+
+
+def stall_source(gc_lift: Optional[float], block_lift: Optional[float]) -> str:
+    """Which (if either) of GC / block fetches slow batches line up with: "gc", "block", or "none"."""
+    lifts = { k: v for k, v in dict(gc=gc_lift, block=block_lift).items() if v is not None and v >= LIFT_THRESHOLD }
+    if not lifts:
+        return 'none'
+    return max(lifts, key=lifts.get)
+
+
+def _int(v) -> Optional[int]:
+    return None if v is None or pd.isna(v) else int(v)
+
+
+def _bool(v) -> Optional[bool]:
+    return None if v is None or pd.isna(v) else bool(v)
+
+
+def analyze_epoch(
+        batches: pd.DataFrame,
+        batch_size: Optional[int] = None,
+        gc_freq: Optional[int] = None,
+        block_size: Optional[int] = None,
+        exclude_first_batch: Optional[bool] = None,
+) -> dict:
+    """Analyze one epoch's per-batch timings (``batch``, ``elapsed_ns``, ``gc_ns`` columns).
+
+    ``exclude_first_batch`` (default: true, as for epochs that predate the column) determines where block boundaries
+    fall: an excluded first batch was read before ``batch`` 0."""
+    batches = batches.sort_values('batch')
+    batch = batches.batch.to_numpy()
+    gc_ns = batches.gc_ns.astype('Float64').fillna(0).to_numpy(dtype=float) if 'gc_ns' in batches else 0
+    ms = (batches.elapsed_ns.to_numpy(dtype=float) + gc_ns) / 1e6
+    rv = dict(n_batches=len(ms), mean_ms=float(ms.mean()))
+    rv.update({ f'{k}_ms': float(np.quantile(ms, q)) for k, q in QUANTILES.items() })
+    rv['max_ms'] = float(ms.max())
+    rv.update({ k: tail_share(ms, frac) for k, frac in TAIL_FRACS.items() })
+    rv.update(periodicity(ms))
+
+    batch_size, gc_freq, block_size = _int(batch_size), _int(gc_freq), _int(block_size)
+    slow = ms >= np.quantile(ms, 1 - SLOW_FRAC)
+    gc_mask = gc_aligned(batch, gc_freq)
+    offset = 0 if _bool(exclude_first_batch) is False else 1
+    block_mask = block_aligned(batch, batch_size, block_size, offset=offset)
+    rv['gc_lift'] = lift(slow[~block_mask], gc_mask[~block_mask])
+    rv['block_lift'] = lift(slow[~gc_mask], block_mask[~gc_mask])
+    rv['batches_per_block'] = block_size / batch_size if batch_size and block_size else None
+    rv['stall_source'] = stall_source(rv['gc_lift'], rv['block_lift'])
+    return rv
+
+
+def analyze_batches(batches_df: pd.DataFrame, epochs_df: pd.DataFrame) -> pd.DataFrame:
+    """Analyze each epoch in ``batches_df``, looking up its ``batch_size`` / ``gc_freq`` / ``block_size`` /
+    ``exclude_first_batch`` in ``epochs_df`` (by ``epoch_id``)."""
+    if batches_df.empty:
+        return pd.DataFrame()
+    cols = [ col for col in EPOCH_COLS if col in epochs_df ]
+    params = (
+        epochs_df.drop_duplicates('epoch_id').set_index('epoch_id')[cols]
+        if 'epoch_id' in epochs_df
+        else pd.DataFrame(columns=cols)
+    )
+    rows = []
+    for epoch_id, batches in batches_df.groupby('epoch_id', sort=False):
+        p = params.loc[epoch_id].to_dict() if epoch_id in params.index else {}
+        rows.append(dict(epoch_id=epoch_id, **analyze_epoch(batches, **p)))
+    df = pd.DataFrame(rows)
+    df['analyzed_dt'] = pd.Timestamp.now()
+    return df
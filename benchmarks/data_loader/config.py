@@ -0,0 +1,122 @@
+import json
+import re
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Sequence, TypeVar
+
+import numpy as np
+import pandas as pd
+
+T = TypeVar('T')
+
+# Metadata fields that identify a data-loader configuration; `config_hash` is computed from these, so that a sweep can
+# be resumed (or split across instances) without re-running configs already present in the DB.
+HASH_KEYS = [
+    'uri',
+    'collection_id',
+    'census_uri',
+    'census_version',
+    'start_idx',
+    'end_idx',
+    'sorted_datasets',
+    'chunk_method',
+    'chunk_size',
+    'chunks_per_block',
+    'batch_size',
+    'max_batches',
+    'exclude_first_batch',
+    'py_buffer_size',
+    'soma_buffer_size',
+    'instance_type',
+    'gc_freq',
+    'ci_target',
+    'gc_mode',
+    'cache_mode',
+    's3_endpoint',
+    'consumer_ms',
+    'consumer_profile',
+]
+# Metadata fields whose values equal these defaults are omitted from hashes (like missing fields), so that configs from
+# before the field was introduced keep their hashes
+HASH_DEFAULTS = {
+    'exclude_first_batch': True,
+    'gc_freq': 10,
+    'gc_mode': 'forced',
+    'cache_mode': 'as-is',
+    'consumer_ms': 0,
+}
+# Metadata fields with these prefixes (e.g. `dp_*`: extra `ExperimentDataPipe` kwargs; `tiledb.*`: TileDB config params) are
+# also hashed
+HASH_PREFIXES = ['dp_', 'tiledb.']
+
+
+def normalize(v):
+    """Canonicalize NumPy/Pandas scalars (as read back from Parquet) to the Python values ``alb data-loader`` writes."""
+    if v is None or (np.isscalar(v) and pd.isna(v)):
+        return None
+    if isinstance(v, (bool, np.bool_)):
+        return bool(v)
+    if isinstance(v, (int, np.integer)):
+        return int(v)
+    if isinstance(v, (float, np.floating)):
+        return int(v) if float(v).is_integer() else float(v)
+    return v
+
+
+def config_hash(metadata: dict, keys: Sequence[str] = HASH_KEYS, prefixes: Sequence[str] = HASH_PREFIXES) -> str:
+    """Stable hash of a config's identifying metadata.
+
+    Missing and ``None`` values (and ``HASH_DEFAULTS``) are omitted, so that adding a new (optional) axis doesn't change
+    the hashes of configs that don't set it.
+    """
+    keys = [ *keys, *( k for k in metadata if any(k.startswith(prefix) for prefix in prefixes) ) ]
+    obj = { k: normalize(metadata.get(k)) for k in keys }
+    obj = { k: v for k, v in obj.items() if v is not None and v != HASH_DEFAULTS.get(k) }
+    return sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def completed_epochs(df: pd.DataFrame) -> dict[str, int | None]:
+    """Map each config hash in an epochs DB to its number of completed epochs.
+
+    Configs with a failure row (``oom`` or ``timeout``) map to ``None``, meaning "don't retry".
+    """
+    if df.empty:
+        return {}
+    hashes = df.apply(lambda r: config_hash(r.to_dict()), axis=1)
+    completed = df.elapsed.notna() if 'elapsed' in df else pd.Series(False, index=df.index)
+    failed = pd.Series(False, index=df.index)
+    for col in ['oom', 'timeout']:
+        if col in df:
+            failed |= df[col].fillna(False).astype(bool)
+    rv = {}
+    for h, n, f in zip(hashes, completed, failed):
+        if f or rv.get(h, 0) is None:
+            rv[h] = None
+        else:
+            rv[h] = rv.get(h, 0) + int(n)
+    return rv
+
+
+@dataclass
+class Shard:
+    idx: int
+    num: int
+
+    RGX = re.compile(r'(?P<idx>\d+)/(?P<num>\d+)')
+
+    @classmethod
+    def parse(cls, s: str) -> 'Shard':
+        m = cls.RGX.fullmatch(s)
+        if not m:
+            raise ValueError(f"Unrecognized shard (expected \"<idx>/<num>\"): {s}")
+        idx, num = int(m['idx']), int(m['num'])
+        if not 0 <= idx < num:
+            raise ValueError(f"Shard index must be in [0,{num}): {s}")
+        return Shard(idx=idx, num=num)
+
+    def select(self, configs: Sequence[T]) -> list[T]:
+        """Round-robin: every ``num``-th config, starting from ``idx``."""
+        return list(configs[self.idx::self.num])
+
+    def __repr__(self):
+        return f'{self.idx}/{self.num}'
@@ -0,0 +1,69 @@
+"""Append-only results "DB": a directory of Parquet files, hive-partitioned by hostname and date.
+
+Each append writes one new file (atomically, via a temp file + rename), so appending costs O(new rows), and concurrent
+writers (e.g. several instances sharing a mounted directory, or several ``alb`` processes on one host) can't clobber
+each other's rows. All readers should go through ``read_df``, which also accepts a single (legacy) Parquet file.
+"""
+from glob import glob
+from os import makedirs, replace
+from os.path import basename, exists, isfile, join
+from socket import gethostname
+from typing import Optional
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow.parquet as pq
+from utz import err
+
+
+def db_files(db_path: str) -> list[str]:
+    """Parquet files comprising the DB at ``db_path`` (skipping in-progress ".tmp" files and other dotfiles)."""
+    if not exists(db_path):
+        return []
+    if isfile(db_path):
+        return [db_path]
+    return sorted(
+        path
+        for path in glob(join(db_path, '**', '*.parquet'), recursive=True)
+        if not basename(path).startswith('.')
+    )
+
+
+def read_df(db_path: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """Read all rows (optionally: only ``columns``) from the DB at ``db_path``; empty if it doesn't exist.
+
+    Files are read individually and concatenated (as opposed to via ``pyarrow.dataset``), so that files written before
+    a column was introduced are still included (with the new column's values missing).
+    """
+    dfs = []
+    for path in db_files(db_path):
+        if columns is None:
+            dfs.append(pd.read_parquet(path))
+        else:
+            names = pq.read_schema(path).names
+            dfs.append(pd.read_parquet(path, columns=[ col for col in columns if col in names ]))
+    dfs = [ df for df in dfs if not df.empty ]
+    if not dfs:
+        return pd.DataFrame()
+    return pd.concat(dfs, ignore_index=True)
+
+
+def append_df(db_path: str, df: pd.DataFrame, name: str = 'records') -> str | None:
+    """Write ``df`` as a new file in the DB at ``db_path``, under a ``hostname=…/date=…`` partition.
+
+    Returns the path of the file written (``None`` if ``df`` is empty).
+    """
+    if df.empty:
+        return None
+    if isfile(db_path):
+        raise ValueError(f"{db_path} is a single Parquet file; move it into a directory, and pass that directory, to append to it")
+    now = pd.Timestamp.now()
+    part_dir = join(db_path, f'hostname={gethostname()}', f'date={now.strftime("%Y-%m-%d")}')
+    makedirs(part_dir, exist_ok=True)
+    name_base = f'{now.strftime("%Y%m%dT%H%M%S.%f")}-{uuid4().hex[:8]}.parquet'
+    path = join(part_dir, name_base)
+    tmp_path = join(part_dir, f'.{name_base}.tmp')
+    df.to_parquet(tmp_path, index=False)
+    replace(tmp_path, path)
+    err(f"Wrote {len(df)} {name} to {path}")
+    return path
@@ -0,0 +1,169 @@
+import fcntl
+import json
+import os
+from glob import glob
+from os.path import join
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from utz import err
+
+from benchmarks.data_loader.analyze import analyze_batches
+from benchmarks.data_loader.db import append_df, read_df
+
+
+def _default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, pd.Timestamp):
+        return o.isoformat()
+    return str(o)
+
+
+def _df_to_json(df: pd.DataFrame) -> dict[str, list]:
+    df = df.astype(object).where(df.notna(), None)
+    return { col: df[col].tolist() for col in df.columns }
+
+
+def _df_from_json(cols: dict[str, list], dtypes: Optional[dict[str, str]] = None) -> pd.DataFrame:
+    """Inverse of ``_df_to_json``; ``dtypes`` (as journaled alongside) restores e.g. nullable ``Int64`` columns, which
+    JSON round-trips as ``object``/``float64``, so that compacted Parquet files match directly-written ones."""
+    df = pd.DataFrame(cols)
+    if dtypes:
+        df = df.astype({ col: dtype for col, dtype in dtypes.items() if col in df })
+    return df
+
+
+class Journal:
+    """Append-only JSONL log of results; each line is flushed and ``fsync``'d as soon as it's written.
+
+    Lines are JSON objects with a ``kind`` field:
+    - ``epoch``: an epoch record (as persisted to the epochs DB)
+    - ``batches`` / ``mem`` / ``gc``: an epoch's per-batch timings / memory samples / GC events, as ``{column: values}``
+      under ``df`` (and ``{column: dtype}`` under ``dtypes``)
+    - ``progress``: a rolling "N batches done" record, written every ``-J/--progress-freq`` batches
+
+    ``lock=True`` holds an exclusive ``flock`` while the journal is open, which tells ``compact`` that it's still being
+    written.
+    """
+    def __init__(self, path: str, lock: bool = False):
+        self.path = path
+        self.file = open(path, 'a')
+        if lock:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def write(self, kind: str, **fields):
+        self.file.write(json.dumps(dict(kind=kind, **fields), default=_default) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def write_epoch(
+            self,
+            record: dict,
+            batches: Optional[pd.DataFrame] = None,
+            mem: Optional[pd.DataFrame] = None,
+            gc: Optional[pd.DataFrame] = None,
+    ):
+        epoch_id = record['epoch_id']
+        for kind, df in dict(batches=batches, mem=mem, gc=gc).items():
+            if df is not None:
+                self.write(kind, epoch_id=epoch_id, df=_df_to_json(df), dtypes=df.dtypes.astype(str).to_dict())
+        # Written last: an "epoch" line implies its batches/mem/gc lines are complete
+        self.write('epoch', record=record)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_journal(path: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Parse a journal into (epoch records, per-batch timings, memory samples, GC events) DataFrames.
+
+    A truncated last line (e.g. from a crash mid-write) is ignored.
+    """
+    records = []
+    dfs = dict(batches=[], mem=[], gc=[])
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                err(f"{path}: skipping malformed line: {line[:100]}")
+                continue
+            kind = obj['kind']
+            if kind == 'epoch':
+                records.append(obj['record'])
+            elif kind in dfs:
+                dfs[kind].append(_df_from_json(obj['df'], obj.get('dtypes')))
+    records_df = pd.DataFrame(records)
+    for col in records_df.columns:
+        if col.endswith('_dt'):
+            records_df[col] = pd.to_datetime(records_df[col])
+
+    def concat(dfs):
+        return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+    return records_df, concat(dfs['batches']), concat(dfs['mem']), concat(dfs['gc'])
+
+
+def _new_rows(df: pd.DataFrame, db_path: str) -> pd.DataFrame:
+    """Rows of ``df`` whose ``epoch_id`` isn't already present in the DB at ``db_path``."""
+    if df.empty or not db_path:
+        return pd.DataFrame()
+    existing = read_df(db_path, columns=['epoch_id'])
+    if existing.empty or 'epoch_id' not in existing:
+        return df
+    return df[~df.epoch_id.isin(set(existing.epoch_id.dropna()))]
+
+
+def compact(
+        journal_dir: str,
+        db_path: str,
+        batches_db_path: Optional[str] = None,
+        mem_db_path: Optional[str] = None,
+        gc_db_path: Optional[str] = None,
+        analysis_db_path: Optional[str] = None,
+) -> int:
+    """Merge journals under ``journal_dir`` into the Parquet DBs, then remove them.
+
+    Epochs (and their batches/mem samples/GC events) already present in the DBs (by ``epoch_id``) are skipped; journals still being
+    written (locked) are left alone. Journaled epochs not yet in ``analysis_db_path`` are analyzed (see
+    ``benchmarks.data_loader.analyze``). Returns the number of epoch records added.
+    """
+    num_added = 0
+    for path in sorted(glob(join(journal_dir, '*.jsonl'))):
+        with open(path, 'r') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                err(f"Skipping {path}: still being written")
+                continue
+            records, batches, mem, gc = read_journal(path)
+            if not records.empty:
+                batches, mem, gc = (
+                    df[df.epoch_id.isin(records.epoch_id)] if not df.empty else df
+                    for df in (batches, mem, gc)
+                )
+            new_records = _new_rows(records, db_path)
+            if not new_records.empty:
+                append_df(db_path, new_records)
+                num_added += len(new_records)
+            if batches_db_path:
+                append_df(batches_db_path, _new_rows(batches, batches_db_path), name='batches')
+            if mem_db_path:
+                append_df(mem_db_path, _new_rows(mem, mem_db_path), name='memory samples')
+            if gc_db_path:
+                append_df(gc_db_path, _new_rows(gc, gc_db_path), name='GC events')
+            if analysis_db_path:
+                new_batches = _new_rows(batches, analysis_db_path)
+                if not new_batches.empty:
+                    append_df(analysis_db_path, analyze_batches(new_batches, records), name='batch analyses')
+            os.remove(path)
+            err(f"Compacted {path}: {len(new_records)} new epoch records")
+    return num_added
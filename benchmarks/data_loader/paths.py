@@ -4,4 +4,10 @@ from benchmarks.paths import NOTEBOOKS_DIR
 
 NB_DIR = join(NOTEBOOKS_DIR, 'data-loader')
 NB_PATH = join(NB_DIR, 'nb.ipynb')
-DEFAULT_PQT_PATH = join(NB_DIR, 'epochs.parquet')
+DEFAULT_PQT_PATH = join(NB_DIR, 'epochs')
+DEFAULT_BATCHES_PQT_PATH = join(NB_DIR, 'batches')
+DEFAULT_MEM_PQT_PATH = join(NB_DIR, 'mem')
+DEFAULT_JOURNAL_DIR = join(NB_DIR, 'journal')
+DEFAULT_ANALYSIS_PQT_PATH = join(NB_DIR, 'batch-analysis')
+DEFAULT_GC_PQT_PATH = join(NB_DIR, 'gc')
+DEFAULT_PROFILE_DIR = join(NB_DIR, 'profiles')
@@ -0,0 +1,350 @@
+import multiprocessing as mp
+import resource
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from os.path import join
+from queue import Empty
+from signal import SIGKILL
+from time import monotonic, perf_counter
+from typing import Callable, Iterator, Optional
+from uuid import uuid4
+
+import pandas as pd
+from utz import err
+
+from benchmarks.benchmark import benchmark, Exp
+from benchmarks.consumer import consumer_summary, make_consumer
+from benchmarks.data_loader.journal import Journal
+from benchmarks.gc_stats import GcRecorder
+from benchmarks.io_stats import IoSampler, io_summary
+from benchmarks.mem import MemSampler
+from benchmarks.null_loader import net_elapsed, null_exp, overhead_summary
+from benchmarks.page_cache import local_path, prepare_cache
+from benchmarks.profiler import PROFILE_FORMATS, Profiler, print_top
+from benchmarks.tiledb_config import effective_tiledb_config
+from benchmarks.tiledb_stats import TiledbStats
+from cellxgene_census.experimental.ml import ExperimentDataPipe, experiment_dataloader
+from somacore import AxisQuery
+from tiledbsoma import SOMATileDBContext, Experiment
+
+
+@dataclass
+class EpochResult:
+    """One epoch's DB record, along with its per-batch timings, memory samples, and GC events (keyed by
+    ``record['epoch_id']``)."""
+    record: dict
+    batches: Optional[pd.DataFrame] = None
+    mem: Optional[pd.DataFrame] = None
+    gc: Optional[pd.DataFrame] = None
+
+
+def run_config(
+        emit: Callable[[EpochResult], None],
+        metadata: dict,
+        uri: Optional[str],
+        tiledb_config: dict,
+        chunk_method: str,
+        chunk_size: int,
+        chunks_per_block: int,
+        batch_size: int = 1024,
+        max_batches: int = 0,
+        num_epochs: int = 1,
+        first_epoch: int = 0,
+        gc_freq: Optional[int] = None,
+        gc_mode: str = 'forced',
+        exclude_first_batch: bool = True,
+        ensure_cuda: bool = True,
+        progress_bar: bool = True,
+        mem_interval: float = 0,
+        journal_path: Optional[str] = None,
+        progress_freq: Optional[int] = None,
+        ci_target: Optional[float] = None,
+        tiledb_stats: bool = False,
+        io_stats: bool = False,
+        cache_mode: str = 'as-is',
+        null_batches: int = 0,
+        consumer_ms: float = 0,
+        consumer_profile: str = 'sleep',
+        profile_format: Optional[str] = None,
+        profile_dir: Optional[str] = None,
+        datapipe_kwargs: Optional[dict] = None,
+        exp_fn: Optional[Callable[..., Experiment]] = None,
+        obs_query: Optional[AxisQuery] = None,
+        var_query: Optional[AxisQuery] = None,
+):
+    """Benchmark epochs ``[first_epoch, num_epochs)`` of one data-loader configuration, passing each epoch's results to
+    ``emit``.
+
+    If ``journal_path`` is set, each epoch's results (and a progress record every ``progress_freq`` batches) are also
+    appended to that ``Journal`` as soon as they're produced.
+
+    ``exp_fn``, if provided, is called with ``tiledb_config=tiledb_config`` to open the experiment (e.g. from Census,
+    whose default config it is merged with); otherwise ``uri`` is opened with a ``SOMATileDBContext(tiledb_config)``.
+    The effective TileDB config is recorded (as JSON) in each epoch's ``tiledb_config`` column.
+
+    If ``tiledb_stats`` is set, TileDB stats are collected during each epoch, and recorded as ``tdb_*`` columns.
+
+    If ``io_stats`` is set, per-batch I/O / page-fault / context-switch / CPU-time deltas are recorded (see
+    ``benchmarks.io_stats``), and summarized (e.g. as read amplification, and CPU utilization) in each epoch's record.
+
+    If ``cache_mode`` is ``cold`` / ``warm`` (and ``uri`` is local), its files are evicted from / read into the OS page
+    cache before opening the experiment, and before each subsequent epoch (see ``benchmarks.page_cache``); time spent
+    doing so is recorded (``cache_prep_s``), but not counted toward the epoch.
+
+    If ``null_batches`` is set, the harness's own per-batch overhead is measured first, by benchmarking that many
+    pre-built batches of the same shape, with the same options (except ``ensure_cuda``; see ``benchmarks.null_loader``); it's recorded as
+    ``harness_*`` columns, along with each epoch's ``elapsed_net`` (``elapsed`` minus that overhead).
+
+    If ``consumer_ms`` is set, each batch is followed by a simulated ``consumer_ms``-millisecond training step (see
+    ``benchmarks.consumer``), and each epoch's data wait (``data_wait_s``, ``data_wait_frac``) and step time
+    (``step_s``) are recorded separately.
+
+    If ``profile_format`` is set, each epoch is profiled with py-spy, writing ``<profile_dir>/<epoch_id>.<ext>``
+    (recorded in the ``profile_path`` column).
+    """
+    journal = Journal(journal_path) if journal_path else None
+    cache_path = local_path(uri) if cache_mode != 'as-is' and not exp_fn else None
+
+    def prep_cache() -> dict:
+        if not cache_path:
+            return {}
+        t = perf_counter()
+        n = prepare_cache(cache_path, cache_mode)
+        return dict(cache_prep_s=perf_counter() - t, cache_prep_bytes=n)
+
+    cache = prep_cache()
+    # Per-config setup phases (recorded in the first epoch's record); see `benchmark` for per-epoch phases
+    t = perf_counter()
+    if exp_fn:
+        experiment = exp_fn(tiledb_config=tiledb_config)
+    else:
+        context = SOMATileDBContext(tiledb_config=tiledb_config)
+        experiment = Experiment.open(uri, context=context)
+    startup = dict(open_s=perf_counter() - t)
+    t = perf_counter()
+    datapipe = ExperimentDataPipe(
+        experiment,
+        measurement_name="RNA",
+        X_name="raw",
+        batch_size=batch_size,
+        shuffle=True,
+        soma_chunk_size=chunk_size,
+        shuffle_chunk_count=chunks_per_block,
+        obs_query=obs_query,
+        var_query=var_query,
+        chunk_method=chunk_method,
+        max_batches=max_batches + (1 if exclude_first_batch else 0),
+        **(datapipe_kwargs or {}),
+    )
+    startup['datapipe_init_s'] = perf_counter() - t
+    effective_config = effective_tiledb_config(experiment.context, tiledb_config)
+    loader = experiment_dataloader(datapipe)
+    exp = Exp(datapipe, loader)
+
+    benchmark_kwargs = dict(
+        batch_size=batch_size,
+        gc_freq=gc_freq,
+        ensure_cuda=ensure_cuda,
+        exclude_first_batch=exclude_first_batch,
+        progress_bar=progress_bar,
+        gc_mode=gc_mode,
+        block_size=chunk_size * chunks_per_block,
+    )
+    harness = {}
+    if null_batches:
+        # Same width as the real batches (without initializing `datapipe`, whose first `shape` is timed by `benchmark`)
+        if var_query is None:
+            n_cols = experiment.ms["RNA"].var.count
+        else:
+            with experiment.axis_query("RNA", var_query=var_query) as query:
+                n_cols = query.n_vars
+        err(f"Calibrating harness overhead: {null_batches} null-loader batches of {batch_size}x{n_cols}")
+        with GcRecorder() as null_gc_recorder:
+            null_epoch = benchmark(
+                null_exp(batch_size, n_cols, n_batches=null_batches, exclude_first_batch=exclude_first_batch),
+                max_batches=null_batches,
+                gc_recorder=null_gc_recorder,
+                io_sampler=IoSampler() if io_stats else None,
+                # Moving null batches to the GPU would time a real host→device copy, which `elapsed_net` would then
+                # subtract from the loader's own timings
+                **{ **benchmark_kwargs, 'ensure_cuda': False },
+            )
+        harness = overhead_summary(null_epoch)
+        err(f"Harness overhead: {1e6 * harness['harness_batch_s']:.1f}μs/batch, median batch {harness['harness_latency_ns'] / 1e3:.1f}μs (p99 {harness['harness_latency_p99_ns'] / 1e3:.1f}μs)")
+
+    for epoch_idx in range(first_epoch, num_epochs):
+        if epoch_idx > first_epoch:
+            cache = prep_cache()
+        epoch_id = uuid4().hex
+        record = dict(
+            epoch=epoch_idx,
+            epoch_id=epoch_id,
+            **metadata,
+            tiledb_config=effective_config,
+            **cache,
+            **harness,
+        )
+        start_dt = pd.Timestamp.now()
+        epoch = None
+        mem_sampler = MemSampler(interval=mem_interval) if mem_interval else None
+        gc_recorder = GcRecorder()
+        stats = TiledbStats() if tiledb_stats else None
+        profiler = None
+        if profile_format:
+            profiler = Profiler(join(profile_dir, f'{epoch_id}.{PROFILE_FORMATS[profile_format]}'), fmt=profile_format)
+        on_progress = None
+        if journal:
+            def on_progress(n_batches, n_rows, elapsed, epoch_id=epoch_id):
+                journal.write('progress', epoch_id=epoch_id, n_batches=n_batches, n_rows=n_rows, elapsed=elapsed)
+        try:
+            with profiler or nullcontext(), mem_sampler or nullcontext(), gc_recorder, stats or nullcontext():
+                epoch = benchmark(
+                    exp,
+                    max_batches=max_batches,
+                    mem_sampler=mem_sampler,
+                    progress_freq=progress_freq,
+                    on_progress=on_progress,
+                    ci_target=ci_target,
+                    gc_recorder=gc_recorder,
+                    io_sampler=IoSampler() if io_stats else None,
+                    consumer=make_consumer(consumer_ms, consumer_profile),
+                    **benchmark_kwargs,
+                )
+        except MemoryError:
+            record.update(oom=True)
+        end_dt = pd.Timestamp.now()
+        record.update(
+            start_dt=start_dt,
+            end_dt=end_dt,
+            max_mem=datapipe.max_process_mem_usage_bytes,
+        )
+        if startup:
+            record.update(startup)
+            startup = None
+        result = EpochResult(record)
+        record.update(gc_recorder.summary())
+        if stats:
+            record.update(stats.summary())
+        if profiler:
+            record['profile_path'] = profiler.path
+            print_top(profiler, name=f'Epoch {epoch_idx}')
+        if gc_recorder.events:
+            result.gc = gc_recorder.to_df()
+            result.gc.insert(0, 'epoch_id', epoch_id)
+        if mem_sampler:
+            record.update(mem_sampler.summary())
+            result.mem = mem_sampler.to_df()
+            result.mem.insert(0, 'epoch_id', epoch_id)
+        if epoch:
+            record.update(
+                n_rows=epoch.n_rows,
+                n_cols=epoch.n_cols,
+                elapsed=epoch.elapsed,
+                gc=epoch.gc,
+                ci_stopped=epoch.ci_stopped,
+                **epoch.phases,
+            )
+            if 'open_s' in record:
+                # Total time from opening the experiment to receiving the first batch
+                record['startup_s'] = sum(
+                    record[k] for k in ('open_s', 'datapipe_init_s', 'shape_s', 'iter_s', 'first_batch_s')
+                    if k in record
+                )
+            if harness:
+                record['elapsed_net'] = net_elapsed(epoch.elapsed, len(epoch.batches), harness['harness_batch_s'])
+            if epoch.steady:
+                record.update(asdict(epoch.steady))
+            if epoch.batches.step_ns is not None:
+                record.update(consumer_summary(epoch.batches.elapsed_ns, epoch.batches.step_ns, epoch.elapsed))
+            if epoch.batches.io is not None:
+                record.update(io_summary(epoch.batches.io, epoch.n_rows, epoch.elapsed))
+            result.batches = epoch.batches.to_df()
+            result.batches.insert(0, 'epoch_id', epoch_id)
+        if journal:
+            journal.write_epoch(result.record, result.batches, result.mem, result.gc)
+        emit(result)
+    if journal:
+        journal.close()
+
+
+def _run_child(queue, mem_limit: Optional[int], kwargs: dict):
+    if mem_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (mem_limit, mem_limit))
+    run_config(emit=queue.put, **kwargs)
+    queue.put(None)
+
+
+def run_isolated(
+        mem_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+        poll_interval: float = 1,
+        **kwargs,
+) -> Iterator[EpochResult]:
+    """Run ``run_config(**kwargs)`` in a fresh (spawned) child process, yielding ``EpochResult``s as they arrive.
+
+    The child's address space is capped at ``mem_limit`` bytes (``RLIMIT_AS``). If the child is killed (e.g. by the
+    kernel OOM-killer), exits with an error, or exceeds ``timeout`` seconds, a "failure" record is yielded for the epoch
+    that was in progress (with ``oom`` / ``timeout`` / ``exitcode`` fields set). A non-zero exit after all epochs
+    completed (e.g. a crash during teardown, after the child's end sentinel) is only logged.
+    """
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_child, args=(queue, mem_limit, kwargs))
+    start_dt = pd.Timestamp.now()
+    start = monotonic()
+    proc.start()
+    num_epochs = 0
+    done = False
+    timed_out = False
+    while not done:
+        try:
+            result = queue.get(timeout=poll_interval)
+        except Empty:
+            if not proc.is_alive():
+                # Drain anything the child flushed before exiting (incl. the sentinel, if it exited cleanly)
+                try:
+                    while (result := queue.get(timeout=poll_interval)) is not None:
+                        num_epochs += 1
+                        yield result
+                    done = True
+                except Empty:
+                    pass
+                break
+            if timeout and monotonic() - start > timeout:
+                err(f"Config exceeded {timeout}s timeout, killing child process {proc.pid}")
+                proc.kill()
+                timed_out = True
+                break
+            continue
+        if result is None:
+            done = True
+        else:
+            num_epochs += 1
+            start_dt = pd.Timestamp.now()
+            yield result
+    proc.join()
+    exitcode = proc.exitcode
+    epoch = kwargs.get('first_epoch', 0) + num_epochs
+    if done or epoch >= kwargs.get('num_epochs', 1):
+        if exitcode != 0:
+            err(f"Child process exited with {exitcode=} after completing its {num_epochs} epochs")
+        return
+
+    record = dict(
+        epoch=epoch,
+        epoch_id=uuid4().hex,
+        **kwargs['metadata'],
+        start_dt=start_dt,
+        end_dt=pd.Timestamp.now(),
+        exitcode=exitcode,
+    )
+    if timed_out:
+        record.update(timeout=True)
+    elif exitcode == -SIGKILL:
+        record.update(oom=True)
+    err(f"Child process failed ({exitcode=}, {timed_out=}) after {num_epochs} epochs")
+    journal_path = kwargs.get('journal_path')
+    if journal_path:
+        with Journal(journal_path) as journal:
+            journal.write_epoch(record)
+    yield EpochResult(record)
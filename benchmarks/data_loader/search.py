@@ -0,0 +1,138 @@
+"""Adaptive (successive-halving) search for the speed-vs-memory Pareto frontier of a sweep's configs.
+
+Every candidate config is first run for a short "probe" (``probe_batches`` batches, 1 epoch). Candidates dominated on
+(samples/sec ↑, memory ↓) are dropped, the probe budget is multiplied by ``factor``, and the survivors are re-probed;
+once the budget reaches the full ``max_batches``, only the surviving frontier is run for the full number of epochs.
+
+Each shuffle block's read lands in one (slow) batch, followed by ``block_size / batch_size`` fast ones, so a probe
+shorter than a block times no block fetch at all. Each candidate's first probe is therefore at least ``PROBE_BLOCKS`` of
+its block periods (``min_batches``; excluding the first batch or not, that covers ``PROBE_BLOCKS`` block reads), and
+its budget is multiplied by ``factor`` from there, so every round probes each survivor for longer than the last (up to
+``max_batches``; a candidate already probed for ``max_batches`` keeps its previous score, rather than being re-run).
+
+To be robust to noisy short probes, each round keeps successive Pareto fronts until at least ``1/factor`` of its
+candidates survive (the first front is always kept in full), so the candidate set shrinks geometrically, and
+configs only ever get dropped for being dominated.
+"""
+from math import ceil
+from typing import Callable, Optional, TypeVar
+
+import pandas as pd
+from utz import err
+
+T = TypeVar('T')
+
+# Minimum number of (whole) shuffle blocks each probe spans
+PROBE_BLOCKS = 2
+# Memory columns, in order of preference (``peak_pss`` requires -i/--mem-interval sampling)
+MEM_OBJECTIVE_COLS = ['peak_pss', 'max_mem']
+
+
+def score(records: pd.DataFrame) -> Optional[tuple[float, float]]:
+    """(samples/sec, peak memory) of a config's epoch records; ``None`` if any epoch failed (OOM/timeout/crash)."""
+    if records.empty or 'elapsed' not in records or records.elapsed.isna().any():
+        return None
+    samples_per_sec = records.n_rows.sum() / records.elapsed.sum()
+    mem = None
+    for col in MEM_OBJECTIVE_COLS:
+        if col in records and records[col].notna().any():
+            mem = float(records[col].max())
+            break
+    return float(samples_per_sec), mem if mem is not None else 0.
+
+
+def dominates(a: tuple[float, float], b: tuple[float, float]) -> bool:
+    """Whether ``a`` is at least as fast and as lean as ``b``, and strictly better on one of them."""
+    return a[0] >= b[0] and a[1] <= b[1] and a != b
+
+
+def pareto_fronts(scores: list[tuple[float, float]]) -> list[list[int]]:
+    """Non-dominated sorting: indices of ``scores`` grouped into successive Pareto fronts (best first)."""
+    remaining = list(range(len(scores)))
+    fronts = []
+    while remaining:
+        front = [
+            i for i in remaining
+            if not any(dominates(scores[j], scores[i]) for j in remaining if j != i)
+        ]
+        fronts.append(front)
+        remaining = [ i for i in remaining if i not in front ]
+    return fronts
+
+
+def select(candidates: list[T], scores: list[Optional[tuple[float, float]]], factor: int) -> list[T]:
+    """Keep the first Pareto front, plus subsequent fronts until at least ``1/factor`` of ``candidates`` are kept;
+    failed candidates (``None`` score) are dropped."""
+    ok = [ i for i, s in enumerate(scores) if s is not None ]
+    target = ceil(len(candidates) / factor)
+    keep = []
+    for front in pareto_fronts([ scores[i] for i in ok ]):
+        if keep and len(keep) >= target:
+            break
+        keep.extend(ok[i] for i in front)
+    return [ candidates[i] for i in sorted(keep) ]
+
+
+def successive_halving(
+        candidates: list[T],
+        run: Callable[[T, int, int, int], pd.DataFrame],
+        max_batches: int,
+        num_epochs: int,
+        probe_batches: int,
+        factor: int = 2,
+        desc: Callable[[T], str] = repr,
+        min_batches: Optional[Callable[[T], int]] = None,
+) -> list[T]:
+    """Search ``candidates`` for the (samples/sec, memory) frontier, returning the configs run at the full budget.
+
+    ``run(candidate, max_batches, num_epochs, search_round)`` runs one config (persisting its records as usual), and
+    returns its epoch records. ``min_batches(candidate)``, if provided, is a floor on ``candidate``'s first probe (e.g.
+    ``PROBE_BLOCKS`` block periods), which is then multiplied by ``factor`` each round.
+    """
+    if factor < 2:
+        raise ValueError(f"Halving factor must be ≥2: {factor}")
+    if not 0 < probe_batches:
+        raise ValueError(f"Probe budget must be positive: {probe_batches}")
+    # Each candidate's first-round probe length
+    starts = []
+    for candidate in candidates:
+        start = probe_batches
+        if min_batches:
+            floor = min_batches(candidate)
+            if floor > start:
+                err(f"Probing {desc(candidate)} from {min(floor, max_batches)} batches ({PROBE_BLOCKS} blocks)")
+                start = floor
+        starts.append(start)
+
+    search_round = 0
+
+    def probe_len(idx: int) -> int:
+        return min(starts[idx] * factor ** search_round, max_batches)
+
+    # Candidates are tracked by index (they needn't be hashable)
+    idxs = list(range(len(candidates)))
+    # Candidate index → (probe length, score), from the previous round
+    prev = {}
+    while len(idxs) > 1 and any(probe_len(idx) < max_batches for idx in idxs):
+        lens = [ probe_len(idx) for idx in idxs ]
+        lens_str = f'{min(lens)}' if min(lens) == max(lens) else f'{min(lens)}-{max(lens)}'
+        err(f"Search round {search_round}: probing {len(idxs)} configs for {lens_str} batches")
+        scores = []
+        for idx, n in zip(idxs, lens):
+            if idx in prev and prev[idx][0] == n:
+                # Already probed at this length (``max_batches``); a re-run would add no evidence
+                scores.append(prev[idx][1])
+            else:
+                scores.append(score(run(candidates[idx], n, 1, search_round)))
+        prev = { idx: (n, s) for idx, n, s in zip(idxs, lens, scores) }
+        survivors = select(idxs, scores, factor)
+        for idx, s in zip(idxs, scores):
+            if idx not in survivors:
+                err(f"Dropping {desc(candidates[idx])}: {'failed' if s is None else 'dominated (%.1f samples/sec, %s mem)' % s}")
+        idxs = survivors
+        search_round += 1
+    candidates = [ candidates[idx] for idx in idxs ]
+    err(f"Search round {search_round}: running {len(candidates)} frontier configs for {max_batches} batches, {num_epochs} epochs")
+    for candidate in candidates:
+        run(candidate, max_batches, num_epochs, search_round)
+    return candidates
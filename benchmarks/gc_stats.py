@@ -0,0 +1,169 @@
+"""Garbage-collection instrumentation (via ``gc.callbacks``), and GC policies to benchmark under.
+
+GC modes (``alb data-loader --gc-mode``):
+- ``default``: Python's automatic GC only
+- ``forced``: automatic GC, plus a ``gc.collect()`` every ``gc_freq`` batches (the historical behavior)
+- ``freeze``: ``gc.freeze()`` after setup (creating the loader iterator, and fetching the first batch), so that
+  long-lived objects created during setup are never re-scanned
+- ``disabled``: ``gc.disable()`` after setup, with a manual ``gc.collect()`` at each shuffle-block boundary (skipped if
+  the loader already did a full collection during that block; ``cellxgene_census``'s datapipe collects before reading
+  each SOMA chunk)
+- ``threshold[:<gen0>]``: raise the generation-0 threshold (default: ``RAISED_GEN0_THRESHOLD``)
+
+Explicit collections by the datapipe itself (``cellxgene_census``'s per-chunk ``run_gc``) are recorded as ``forced``,
+like the benchmark's own; unlike those, they happen inside ``next()``, so they're included in batch timings.
+
+Only collections in the benchmarking process are observed (not e.g. in ``DataLoader`` worker processes).
+"""
+import gc
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+GC_MODES = ['default', 'forced', 'freeze', 'disabled', 'threshold']
+RAISED_GEN0_THRESHOLD = 50_000
+# Functions (module, name) whose `gc.collect()` calls are recorded as forced
+FORCED_GC_CALLERS = [('cellxgene_census', 'run_gc')]
+
+
+def full_collections() -> int:
+    """Number of (generation-2) collections so far."""
+    return gc.get_stats()[2]['collections']
+
+
+def forced_by_caller(frame) -> bool:
+    """Whether ``frame`` (the code that triggered a collection) is one of ``FORCED_GC_CALLERS``."""
+    if frame is None:
+        return False
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '')
+    return any(code.co_name == name and module.startswith(pkg) for pkg, name in FORCED_GC_CALLERS)
+
+
+@dataclass
+class GcMode:
+    name: str
+    gen0_threshold: Optional[int] = None
+
+    @classmethod
+    def parse(cls, s: str) -> 'GcMode':
+        if isinstance(s, GcMode):
+            return s
+        name, _, arg = s.partition(':')
+        if name not in GC_MODES:
+            raise ValueError(f"Unrecognized GC mode: {s} (options: {', '.join(GC_MODES)})")
+        if arg and name != 'threshold':
+            raise ValueError(f"GC mode {name} doesn't take an argument: {s}")
+        if name == 'threshold':
+            return cls(name, int(arg) if arg else RAISED_GEN0_THRESHOLD)
+        return cls(name)
+
+    @property
+    def forced(self) -> bool:
+        """Whether ``gc.collect()`` is called every ``gc_freq`` batches."""
+        return self.name == 'forced'
+
+    def __str__(self):
+        return f'{self.name}:{self.gen0_threshold}' if self.name == 'threshold' else self.name
+
+    def __repr__(self):
+        return str(self)
+
+
+@contextmanager
+def gc_policy(mode: GcMode):
+    """Apply ``mode``'s GC settings (freeze / disable / thresholds) for the duration of the context, then restore."""
+    if mode.name == 'freeze':
+        gc.collect()
+        gc.freeze()
+        try:
+            yield
+        finally:
+            gc.unfreeze()
+    elif mode.name == 'disabled':
+        was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            yield
+        finally:
+            if was_enabled:
+                gc.enable()
+    elif mode.name == 'threshold':
+        thresholds = gc.get_threshold()
+        gc.set_threshold(mode.gen0_threshold, *thresholds[1:])
+        try:
+            yield
+        finally:
+            gc.set_threshold(*thresholds)
+    else:
+        yield
+
+
+class GcRecorder:
+    """Record every garbage collection (generation, duration, objects collected), attributed to the current batch.
+
+    Set ``batch`` as batches are iterated (like ``MemSampler``), and ``forced`` around explicit ``gc.collect()`` calls.
+    """
+    COLUMNS = ['batch', 'generation', 'duration_ns', 'collected', 'uncollectable', 'forced']
+
+    def __init__(self):
+        self.batch = 0
+        self.forced = False
+        self.events = []
+        self._start = None
+        self._caller_forced = False
+
+    def _callback(self, phase: str, info: dict):
+        if phase == 'start':
+            # `gc.collect()` (a C function) has no frame, so the caller is the next frame up
+            self._caller_forced = info['generation'] == 2 and forced_by_caller(sys._getframe(1))
+            self._start = perf_counter_ns()
+        elif self._start is not None:
+            self.events.append((
+                self.batch,
+                info['generation'],
+                perf_counter_ns() - self._start,
+                info['collected'],
+                info['uncollectable'],
+                self.forced or self._caller_forced,
+            ))
+            self._start = None
+
+    def __enter__(self) -> 'GcRecorder':
+        gc.callbacks.append(self._callback)
+        return self
+
+    def __exit__(self, *exc):
+        gc.callbacks.remove(self._callback)
+
+    def to_df(self) -> pd.DataFrame:
+        return pd.DataFrame(self.events, columns=self.COLUMNS).astype(dict(
+            batch=np.int64,
+            generation=np.int8,
+            duration_ns=np.int64,
+            collected=np.int64,
+            uncollectable=np.int64,
+            forced=bool,
+        ))
+
+    def auto_ns(self, n: int) -> np.ndarray:
+        """Total duration of automatic (not ``forced``) collections during each of the first ``n`` batches."""
+        df = self.to_df()
+        df = df[~df.forced & (df.batch < n)]
+        return np.bincount(df.batch, weights=df.duration_ns, minlength=n).astype(np.int64)
+
+    def summary(self) -> dict:
+        """Number of automatic collections per generation, their total / max duration, and the number of forced ones."""
+        df = self.to_df()
+        auto = df[~df.forced]
+        return dict(
+            **{ f'gc_auto_gen{gen}': int((auto.generation == gen).sum()) for gen in range(3) },
+            gc_auto=float(auto.duration_ns.sum() / 1e9),
+            gc_auto_max_ms=float(auto.duration_ns.max() / 1e6) if not auto.empty else None,
+            gc_forced=int(df.forced.sum()),
+        )
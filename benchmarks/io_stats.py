@@ -0,0 +1,139 @@
+"""Per-batch I/O and CPU accounting for a process tree (e.g. main process + DataLoader workers), from ``/proc``.
+
+For each batch, records the change in (summed over the benchmarking process and its children):
+- ``/proc/<pid>/io``: ``read_bytes`` (bytes actually fetched from storage), ``rchar`` (bytes passed to ``read()``-like
+  syscalls, incl. page-cache hits), ``syscr`` (number of read syscalls)
+- ``getrusage`` (main process) / ``/proc/<pid>/stat`` and ``/proc/<pid>/status`` (children): minor / major page faults,
+  voluntary / involuntary context switches, and user+system CPU time
+
+With a simulated training step (``alb data-loader -Y``), the step's own CPU time (in the main thread) is recorded as
+``step_cpu_ns``, and excluded from ``cpu_ns``, so that CPU columns reflect the loader's cost.
+
+The process tree is re-scanned for new (or exited) children every ``REFRESH_S`` seconds, so a newly-spawned worker's
+counters are picked up within about that long, regardless of batch rate.
+
+When a child exits and is reaped, the kernel folds its I/O counters into its parent's ``/proc/<pid>/io``; to avoid
+double-counting, its last-seen I/O counters are subtracted from the batch during which it disappears. The sampler's own
+``/proc`` reads add a few syscalls (and ~100 bytes of ``rchar``) per batch to the main process.
+
+Linux-only. S3 reads go over sockets (``recv``), so they don't show up in ``read_bytes`` / ``rchar``; use TileDB stats
+(``alb data-loader -L``) for those.
+"""
+import os
+import resource
+from time import monotonic
+from typing import Optional
+
+import numpy as np
+import psutil
+
+IO_COLS = ['read_bytes', 'rchar', 'syscr', 'min_flt', 'maj_flt', 'nvcsw', 'nivcsw', 'cpu_ns', 'worker_cpu_ns', 'step_cpu_ns']
+IO_FIELDS = ['read_bytes', 'rchar', 'syscr']
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+# Re-scan the process tree for new/exited children every this many seconds
+REFRESH_S = .5
+
+
+def read_proc_io(pid: int | str = 'self') -> list[int]:
+    """``IO_FIELDS`` from ``/proc/<pid>/io``."""
+    with open(f'/proc/{pid}/io') as f:
+        fields = dict(line.split(': ', 1) for line in f.read().splitlines())
+    return [ int(fields[k]) for k in IO_FIELDS ]
+
+
+def read_proc_rusage(pid: int) -> list[int]:
+    """(min_flt, maj_flt, nvcsw, nivcsw, cpu_ns) of another process, from ``/proc/<pid>/{stat,status}``."""
+    with open(f'/proc/{pid}/stat') as f:
+        # Skip past the (parenthesized, possibly space-containing) command name
+        stat = f.read().rsplit(')', 1)[1].split()
+    min_flt, maj_flt = int(stat[7]), int(stat[9])
+    cpu_ns = (int(stat[11]) + int(stat[12])) * 1_000_000_000 // CLK_TCK
+    nvcsw = nivcsw = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('voluntary_ctxt_switches'):
+                nvcsw = int(line.split()[1])
+            elif line.startswith('nonvoluntary_ctxt_switches'):
+                nivcsw = int(line.split()[1])
+    return [min_flt, maj_flt, nvcsw, nivcsw, cpu_ns]
+
+
+def self_counters() -> np.ndarray:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_ns = int((ru.ru_utime + ru.ru_stime) * 1e9)
+    return np.array([
+        *read_proc_io(),
+        ru.ru_minflt, ru.ru_majflt, ru.ru_nvcsw, ru.ru_nivcsw,
+        cpu_ns, 0, 0,
+    ], dtype=np.int64)
+
+
+def child_counters(pid: int) -> np.ndarray:
+    min_flt, maj_flt, nvcsw, nivcsw, cpu_ns = read_proc_rusage(pid)
+    return np.array([*read_proc_io(pid), min_flt, maj_flt, nvcsw, nivcsw, 0, cpu_ns, 0], dtype=np.int64)
+
+
+class IoSampler:
+    """Sample cumulative ``IO_COLS`` counters of this process and its children; ``delta()`` returns the change since
+    the previous call.
+
+    Children's counters are tracked per-PID, so that workers exiting (or being spawned) don't produce negative (or
+    inflated) deltas; a new child's counters count in full toward the batch during which it's first seen, and an exited
+    child's I/O is un-counted from its parent's (see module docstring).
+    """
+    def __init__(self):
+        self.proc = psutil.Process()
+        self.children = []
+        self.last = {}
+        self.refreshed = None
+
+    def _refresh(self):
+        self.children = [ child.pid for child in self.proc.children(recursive=True) ]
+        self.refreshed = monotonic()
+
+    def _sample(self) -> dict[Optional[int], np.ndarray]:
+        counters = { None: self_counters() }
+        for pid in self.children:
+            try:
+                counters[pid] = child_counters(pid)
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                continue
+        return counters
+
+    def start(self):
+        """Take the baseline sample (e.g. just before the first measured batch)."""
+        self._refresh()
+        self.last = self._sample()
+
+    def delta(self, step_cpu_ns: int = 0) -> np.ndarray:
+        """Change in ``IO_COLS`` since the previous call; ``step_cpu_ns`` (CPU time spent in a simulated training step,
+        since then) is moved from ``cpu_ns`` to ``step_cpu_ns``."""
+        if monotonic() - self.refreshed >= REFRESH_S:
+            self._refresh()
+        counters = self._sample()
+        rv = np.zeros(len(IO_COLS), dtype=np.int64)
+        for pid, cur in counters.items():
+            prev = self.last.get(pid)
+            rv += cur - prev if prev is not None else cur
+        for pid in set(self.last) - set(counters):
+            rv[:len(IO_FIELDS)] -= self.last[pid][:len(IO_FIELDS)]
+        self.last = counters
+        if step_cpu_ns:
+            rv[IO_COLS.index('cpu_ns')] -= step_cpu_ns
+            rv[IO_COLS.index('step_cpu_ns')] = step_cpu_ns
+        return rv
+
+
+def io_summary(io: np.ndarray, n_rows: int, elapsed: float) -> dict:
+    """Epoch totals of per-batch ``IO_COLS`` deltas (``io_<col>``), read amplification (bytes read / ``rchar`` per
+    row delivered), and CPU efficiency (cores used on average, and CPU μs per row; excluding simulated training steps)."""
+    totals = { col: int(v) for col, v in zip(IO_COLS, io.sum(axis=0)) }
+    cpu_s = (totals['cpu_ns'] + totals['worker_cpu_ns']) / 1e9
+    return dict(
+        **{ f'io_{col}': v for col, v in totals.items() },
+        read_bytes_per_row=totals['read_bytes'] / n_rows if n_rows else None,
+        rchar_per_row=totals['rchar'] / n_rows if n_rows else None,
+        cpu_s=cpu_s,
+        cpu_util=cpu_s / elapsed if elapsed else None,
+        cpu_us_per_row=1e6 * cpu_s / n_rows if n_rows else None,
+    )
@@ -0,0 +1,85 @@
+from threading import Event, Thread
+from time import perf_counter_ns
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import psutil
+
+# Epoch-record memory columns, and axis labels for plotting them
+MEM_COLS = {
+    'max_mem': 'Max. memory usage',
+    'peak_pss': 'Peak memory usage (PSS, incl. workers)',
+    'steady_pss': 'Steady-state memory usage (PSS, incl. workers)',
+    'peak_rss': 'Peak memory usage (RSS, incl. workers)',
+    'peak_uss': 'Peak memory usage (USS, incl. workers)',
+}
+
+
+class MemSampler:
+    """Sample memory usage of a process tree (e.g. main process + DataLoader workers) on a background thread.
+
+    Each sample sums RSS/USS/PSS over the process and all its (recursive) children, and is tagged with ``batch``,
+    which the benchmark loop updates to the index of the batch currently being fetched (-1 before the first batch).
+    """
+    COLUMNS = ['t_ns', 'batch', 'rss', 'uss', 'pss', 'n_procs']
+
+    def __init__(self, interval: float = 0.1, pid: Optional[int] = None):
+        self.interval = interval
+        self.proc = psutil.Process(pid)
+        self.batch = -1
+        self.samples = []
+        self._start_ns = None
+        self._stop = Event()
+        self._thread = None
+
+    def sample(self):
+        rss = uss = pss = n_procs = 0
+        for proc in [self.proc, *self.proc.children(recursive=True)]:
+            try:
+                m = proc.memory_full_info()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            rss += m.rss
+            uss += m.uss
+            pss += getattr(m, 'pss', 0)  # Linux only
+            n_procs += 1
+        self.samples.append((perf_counter_ns() - self._start_ns, self.batch, rss, uss, pss, n_procs))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self) -> 'MemSampler':
+        self.batch = -1
+        self.samples = []
+        self._start_ns = perf_counter_ns()
+        self._stop.clear()
+        self.sample()
+        self._thread = Thread(target=self._run, name='MemSampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.sample()
+
+    def to_df(self) -> pd.DataFrame:
+        return pd.DataFrame(self.samples, columns=self.COLUMNS)
+
+    def summary(self) -> dict:
+        """Peak RSS/USS/PSS, and "steady-state" PSS (median over samples taken during the latter half of batches)."""
+        if not self.samples:
+            return {}
+        df = self.to_df()
+        last_batch = df.batch.max()
+        steady = df[df.batch >= last_batch / 2] if last_batch > 0 else df
+        return dict(
+            peak_rss=int(df.rss.max()),
+            peak_uss=int(df.uss.max()),
+            peak_pss=int(df.pss.max()),
+            steady_pss=int(np.median(steady.pss)),
+            max_procs=int(df.n_procs.max()),
+        )
@@ -0,0 +1,69 @@
+"""A "null" data loader, yielding one pre-built batch over and over, for calibrating the benchmarking harness itself.
+
+``benchmark`` does some bookkeeping per batch (timestamps, array writes, progress bar, CUDA check, periodic GC, optional
+I/O sampling); at high samples/sec (e.g. small batches, served from the page cache), that can be a noticeable fraction
+of each batch's time. Running ``benchmark`` over a ``null_exp`` (with the same options, minus ``ensure_cuda``, whose
+host→device copy is real work) measures that overhead, i.e. the floor below which per-batch latencies (and above which
+samples/sec) can't be measured.
+"""
+from typing import Optional
+
+import numpy as np
+import torch
+
+from benchmarks.benchmark import Epoch, Exp
+
+# Default number of null-loader batches to time
+NULL_BATCHES = 1000
+
+
+class NullDataPipe:
+    """Stands in for an ``ExperimentDataPipe``: just a ``shape``."""
+    def __init__(self, n_rows: int, n_cols: int):
+        self.shape = (n_rows, n_cols)
+
+
+class NullLoader:
+    """Yield the same ``(X, obs)`` batch (like ``experiment_dataloader``'s) ``n_batches`` times."""
+    def __init__(self, batch: tuple, n_batches: int):
+        self.batch = batch
+        self.n_batches = n_batches
+
+    def __iter__(self):
+        batch = self.batch
+        for _ in range(self.n_batches):
+            yield batch
+
+    def __len__(self):
+        return self.n_batches
+
+
+def null_exp(batch_size: int, n_cols: int, n_batches: int = NULL_BATCHES, exclude_first_batch: bool = True) -> Exp:
+    """``Exp`` whose loader yields ``n_batches`` (plus one, if ``exclude_first_batch``) pre-built ``batch_size`` ×
+    ``n_cols`` batches."""
+    batch = (
+        torch.zeros((batch_size, n_cols), dtype=torch.float32),
+        torch.zeros((batch_size, 1), dtype=torch.int64),
+    )
+    loader = NullLoader(batch, n_batches + (1 if exclude_first_batch else 0))
+    return Exp(NullDataPipe(n_batches * batch_size, n_cols), loader)
+
+
+def overhead_summary(epoch: Epoch) -> dict:
+    """``harness_``-prefixed columns, from a null-loader epoch: mean wall-clock seconds per batch (all bookkeeping
+    included, as in an epoch's ``elapsed``), and median / p99 of the per-batch timings (the floor of measurable
+    ``elapsed_ns``)."""
+    n = len(epoch.batches)
+    elapsed_ns = epoch.batches.elapsed_ns
+    return dict(
+        harness_batch_s=epoch.elapsed / n if n else None,
+        harness_latency_ns=float(np.median(elapsed_ns)) if n else None,
+        harness_latency_p99_ns=float(np.percentile(elapsed_ns, 99)) if n else None,
+    )
+
+
+def net_elapsed(elapsed: float, n_batches: int, harness_batch_s: Optional[float]) -> Optional[float]:
+    """``elapsed``, minus the harness's overhead for ``n_batches`` batches."""
+    if harness_batch_s is None:
+        return None
+    return max(elapsed - n_batches * harness_batch_s, 0.)
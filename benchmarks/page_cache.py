@@ -0,0 +1,73 @@
+"""Control the OS page cache's contents for a local dataset, so that epochs see a consistently cold (or warm) disk.
+
+Cache modes (``alb data-loader --cache-mode``):
+- ``as-is``: leave the page cache alone (later epochs of local runs are largely served from memory)
+- ``cold``: evict the dataset's files before each epoch, with ``posix_fadvise(POSIX_FADV_DONTNEED)`` (unprivileged,
+  unlike ``echo 1 > /proc/sys/vm/drop_caches``). Pages that are dirty, or mapped by other processes, may survive.
+- ``warm``: read every file in full before each epoch
+"""
+import os
+from os.path import isdir, join
+from typing import Iterator, Optional
+from urllib.parse import urlparse
+
+CACHE_MODES = ['as-is', 'cold', 'warm']
+READ_SIZE = 8 * 1024**2
+
+
+def local_path(uri: Optional[str]) -> Optional[str]:
+    """Filesystem path of a local (or ``file://``) URI; ``None`` for remote (e.g. S3) URIs."""
+    if not uri:
+        return None
+    parsed = urlparse(uri)
+    if parsed.scheme == 'file':
+        return parsed.path
+    if not parsed.scheme:
+        return uri
+    return None
+
+
+def iter_files(path: str) -> Iterator[str]:
+    if not isdir(path):
+        yield path
+        return
+    for root, _, files in os.walk(path):
+        for name in files:
+            yield join(root, name)
+
+
+def evict(path: str) -> int:
+    """Drop (clean) pages of every file under ``path`` from the page cache; returns the total size of those files."""
+    if not hasattr(os, 'posix_fadvise'):
+        raise RuntimeError("Evicting files from the page cache requires `posix_fadvise` (Linux)")
+    total = 0
+    for file in iter_files(path):
+        fd = os.open(file, os.O_RDONLY)
+        try:
+            total += os.fstat(fd).st_size
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return total
+
+
+def warm(path: str) -> int:
+    """Read every file under ``path`` in full (populating the page cache); returns the number of bytes read."""
+    total = 0
+    buf = bytearray(READ_SIZE)
+    for file in iter_files(path):
+        with open(file, 'rb', buffering=0) as f:
+            while n := f.readinto(buf):
+                total += n
+    return total
+
+
+def prepare_cache(path: str, mode: str) -> int:
+    """Apply cache ``mode`` to the files under ``path``; returns the number of bytes evicted / read."""
+    if mode == 'cold':
+        return evict(path)
+    elif mode == 'warm':
+        return warm(path)
+    elif mode == 'as-is':
+        return 0
+    raise ValueError(f"Unrecognized cache mode: {mode} (options: {', '.join(CACHE_MODES)})")
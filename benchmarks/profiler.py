@@ -0,0 +1,130 @@
+"""Sampling-profiler capture (via `py-spy`_) around benchmarked code, and "top self-time functions" summaries.
+
+`py-spy` attaches to the current process (and its subprocesses, e.g. ``DataLoader`` workers) from outside, so
+un-profiled runs pay nothing. Native (C/C++/Cython) frames are included where `py-spy` supports it (falling back to
+Python-only stacks otherwise). Idle threads (e.g. blocked waiting on TileDB I/O) aren't sampled, so self time
+approximates CPU time.
+
+.. _py-spy: https://github.com/benfred/py-spy
+"""
+import json
+import os
+from collections import Counter
+from os import makedirs
+from os.path import dirname, exists
+from signal import SIGINT
+from subprocess import DEVNULL, PIPE, Popen
+from time import sleep
+from typing import Optional
+
+import pandas as pd
+from utz import err
+
+# Format (`py-spy record --format`) → file extension
+PROFILE_FORMATS = {
+    'speedscope': 'speedscope.json',
+    'raw': 'collapsed.txt',
+}
+DEFAULT_RATE = 100
+# Time to let `py-spy` attach before starting the benchmarked code
+ATTACH_WAIT = 0.5
+TOP_N = 20
+
+
+class Profiler:
+    """Run ``py-spy record`` against this process for the duration of the context, writing samples to ``path``."""
+    def __init__(self, path: str, fmt: str = 'speedscope', rate: int = DEFAULT_RATE, native: bool = True):
+        if fmt not in PROFILE_FORMATS:
+            raise ValueError(f"Unrecognized profile format: {fmt} (options: {', '.join(PROFILE_FORMATS)})")
+        self.path = path
+        self.fmt = fmt
+        self.rate = rate
+        self.native = native
+        self.proc = None
+
+    def _start(self, native: bool) -> Popen:
+        cmd = [
+            'py-spy', 'record',
+            '--pid', str(os.getpid()),
+            '--subprocesses',
+            '--function',
+            '--rate', str(self.rate),
+            '--format', self.fmt,
+            '--output', self.path,
+        ]
+        if native:
+            cmd.append('--native')
+        else:
+            # Python-only sampling doesn't need to pause the process
+            cmd.append('--nonblocking')
+        return Popen(cmd, stdout=DEVNULL, stderr=PIPE)
+
+    def __enter__(self) -> 'Profiler':
+        makedirs(dirname(self.path) or '.', exist_ok=True)
+        self.proc = self._start(self.native)
+        sleep(ATTACH_WAIT)
+        if self.native and self.proc.poll() is not None:
+            err(f"py-spy --native failed ({self.proc.stderr.read().decode().strip()}), retrying without native frames")
+            self.proc = self._start(native=False)
+            sleep(ATTACH_WAIT)
+        return self
+
+    def __exit__(self, *exc):
+        proc = self.proc
+        if proc.poll() is None:
+            # `py-spy record` writes its output on SIGINT
+            proc.send_signal(SIGINT)
+        proc.wait()
+        if not exists(self.path):
+            err(f"py-spy failed to write {self.path} (exit code {proc.returncode}): {proc.stderr.read().decode().strip()}")
+
+    def top(self, n: int = TOP_N) -> Optional[pd.DataFrame]:
+        """The ``n`` functions with the most self (leaf) samples; ``None`` if no profile was written."""
+        if not exists(self.path):
+            return None
+        return top_self(load_self_times(self.path, self.fmt, self.rate), n)
+
+
+def load_self_times(path: str, fmt: str, rate: int = DEFAULT_RATE) -> Counter:
+    """Seconds each function spent as the leaf (innermost) frame of the sampled stacks."""
+    counts = Counter()
+    if fmt == 'raw':
+        # Collapsed stacks: "<frame>;<frame>;… <count>" per line
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    counts[stack.rsplit(';', 1)[-1]] += int(count) / rate
+    elif fmt == 'speedscope':
+        with open(path) as f:
+            obj = json.load(f)
+        frames = obj['shared']['frames']
+        names = [
+            f"{frame['name']} ({frame['file']}:{frame['line']})" if frame.get('file') else frame['name']
+            for frame in frames
+        ]
+        # One profile per sampled thread, with per-sample weights in seconds
+        for profile in obj['profiles']:
+            for sample, weight in zip(profile['samples'], profile['weights']):
+                if sample:
+                    counts[names[sample[-1]]] += weight
+    else:
+        raise ValueError(f"Unrecognized profile format: {fmt}")
+    return counts
+
+
+def top_self(counts: Counter, n: int = TOP_N) -> pd.DataFrame:
+    total = sum(counts.values())
+    df = pd.DataFrame(counts.most_common(n), columns=['function', 'self_s'])
+    df['self_frac'] = df.self_s / total if total else 0.
+    return df
+
+
+def print_top(profiler: Profiler, n: int = TOP_N, name: Optional[str] = None):
+    """Print ``profiler``'s top ``n`` self-time functions (and where its full profile was written)."""
+    df = profiler.top(n)
+    if df is None:
+        return
+    err(f"{name + ' ' if name else ''}profile: {profiler.path}; top {len(df)} functions by self time:")
+    for row in df.itertuples():
+        err(f"  {row.self_frac:6.1%}  {row.self_s:7.2f}s  {row.function}")
@@ -0,0 +1,345 @@
+"""Minimal read-only S3-compatible HTTP server, for benchmarking "remote" reads of a local SOMA experiment.
+
+Serves a local directory as a single bucket (path-style addressing: ``http://<host>:<port>/<bucket>/<key>``), with
+injectable per-request latency (time to first byte), an aggregate bandwidth cap (shared by all connections), and a
+request-rate limit (requests beyond it get S3's ``503 SlowDown``, exercising clients' retry/backoff).
+
+Supports the subset of the S3 API that TileDB uses for reading: ``GetObject`` (incl. ``Range``), ``HeadObject``,
+``HeadBucket``, ``GetBucketLocation``, and ``ListObjects`` (v1 and v2, with ``prefix`` / ``delimiter`` / pagination).
+Request signatures aren't checked.
+"""
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import formatdate
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import getmtime, getsize, isdir, isfile, join, realpath, relpath
+from threading import Lock
+from time import monotonic, sleep
+from typing import Optional
+from urllib.parse import parse_qs, quote, unquote, urlparse
+from xml.sax.saxutils import escape
+
+from utz import err
+
+DEFAULT_BUCKET = 'local'
+DEFAULT_PORT = 9000
+DEFAULT_MAX_KEYS = 1000
+WRITE_CHUNK = 64 * 1024
+XMLNS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+def tiledb_s3_config(endpoint: str) -> dict:
+    """TileDB config params for reading ``s3://`` URIs from an emulator at ``endpoint`` (``<host>:<port>``)."""
+    return {
+        'vfs.s3.endpoint_override': endpoint,
+        'vfs.s3.scheme': 'http',
+        'vfs.s3.use_virtual_addressing': 'false',
+        # Not checked by the emulator, but the AWS SDK won't send requests without some credentials
+        'vfs.s3.aws_access_key_id': 'emulator',
+        'vfs.s3.aws_secret_access_key': 'emulator',
+    }
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` tokens/sec, holding at most ``burst`` tokens."""
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1., rate)
+        self.tokens = self.burst
+        self.t = monotonic()
+        self.lock = Lock()
+
+    def try_acquire(self, n: float = 1) -> bool:
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.t) * self.rate)
+            self.t = now
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            return True
+
+
+class BandwidthCap:
+    """Pace writes (across all connections) so that at most ``bandwidth`` bytes/sec are sent in aggregate."""
+    def __init__(self, bandwidth: float):
+        self.bandwidth = bandwidth
+        self.free_at = monotonic()
+        self.lock = Lock()
+
+    def consume(self, n: int):
+        with self.lock:
+            now = monotonic()
+            self.free_at = max(now, self.free_at) + n / self.bandwidth
+            wait = self.free_at - now
+        sleep(wait)
+
+
+@dataclass
+class Stats:
+    requests: int = 0
+    bytes_sent: int = 0
+    throttled: int = 0
+    lock: Lock = field(default_factory=Lock)
+
+    def add(self, requests: int = 0, bytes_sent: int = 0, throttled: int = 0):
+        with self.lock:
+            self.requests += requests
+            self.bytes_sent += bytes_sent
+            self.throttled += throttled
+
+    def __str__(self):
+        return f'{self.requests} requests, {self.bytes_sent} bytes sent, {self.throttled} throttled'
+
+
+def resolve(root: str, key: str) -> Optional[str]:
+    """Local path of ``key`` under ``root``; ``None`` if it resolves (e.g. via ``..`` or symlinks) outside ``root``."""
+    root = realpath(root)
+    path = realpath(join(root, *key.split('/')))
+    if path != root and not path.startswith(root.rstrip(os.sep) + os.sep):
+        return None
+    return path
+
+
+def list_entries(root: str, prefix: str, delimiter: Optional[str]) -> list[tuple[str, Optional[str]]]:
+    """Sorted (key, path) pairs under ``prefix``; keys rolled up by ``delimiter`` ("common prefixes") have path
+    ``None``."""
+    # Only walk the deepest directory containing `prefix`
+    base = prefix.rsplit('/', 1)[0] if '/' in prefix else ''
+    start = resolve(root, base)
+    if start is None or not isdir(start):
+        return []
+    entries = {}
+    for dirpath, _, files in os.walk(start):
+        for name in files:
+            path = join(dirpath, name)
+            key = relpath(path, root).replace(os.sep, '/')
+            if not key.startswith(prefix):
+                continue
+            if delimiter:
+                idx = key.find(delimiter, len(prefix))
+                if idx >= 0:
+                    entries[key[:idx + len(delimiter)]] = None
+                    continue
+            entries[key] = path
+    return sorted(entries.items())
+
+
+def etag(path: str) -> str:
+    return '"%s"' % md5(f'{path}:{getsize(path)}:{getmtime(path)}'.encode()).hexdigest()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """(start, end) (inclusive) of a single-range ``Range: bytes=…`` header; ``None`` ⇒ whole object.
+
+    Raises ``ValueError`` if the range is malformed."""
+    if not header or not header.startswith('bytes='):
+        return None
+    start, _, end = header[len('bytes='):].split(',')[0].strip().partition('-')
+    if not start:
+        # Suffix range: last `end` bytes
+        n = int(end)
+        return max(0, size - n), size - 1
+    return int(start), min(int(end), size - 1) if end else size - 1
+
+
+def make_handler(
+        root: str,
+        bucket: str,
+        latency: float = 0,
+        bandwidth: Optional[BandwidthCap] = None,
+        limiter: Optional[RateLimiter] = None,
+        stats: Optional[Stats] = None,
+        verbose: bool = False,
+):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive (the AWS SDK reuses connections)
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            if verbose:
+                err(f'{self.address_string()} {fmt % args}')
+
+        def _send(self, status: int, body: bytes = b'', headers: Optional[dict] = None, head: bool = False):
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body and not head:
+                self._write(body)
+
+        def _write(self, body: bytes):
+            for i in range(0, len(body), WRITE_CHUNK):
+                chunk = body[i:i + WRITE_CHUNK]
+                if bandwidth:
+                    bandwidth.consume(len(chunk))
+                self.wfile.write(chunk)
+            if stats:
+                stats.add(bytes_sent=len(body))
+
+        def _error(self, status: int, code: str, message: str, head: bool = False):
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>'
+            ).encode()
+            self._send(status, body, {'Content-Type': 'application/xml'}, head=head)
+
+        def _admit(self, head: bool = False) -> bool:
+            if stats:
+                stats.add(requests=1)
+            if limiter and not limiter.try_acquire():
+                if stats:
+                    stats.add(throttled=1)
+                self._error(503, 'SlowDown', 'Please reduce your request rate.', head=head)
+                return False
+            if latency:
+                sleep(latency)
+            return True
+
+        def _parse(self) -> tuple[Optional[str], str, dict]:
+            url = urlparse(self.path)
+            b, _, key = url.path.lstrip('/').partition('/')
+            return (b or None), unquote(key), { k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items() }
+
+        def do_HEAD(self):
+            self._handle(head=True)
+
+        def do_GET(self):
+            self._handle(head=False)
+
+        def _handle(self, head: bool):
+            if not self._admit(head=head):
+                return
+            b, key, query = self._parse()
+            if b != bucket:
+                return self._error(404, 'NoSuchBucket', f'Bucket {b} not found', head=head)
+            if not key:
+                if head:
+                    return self._send(200, head=True)
+                if 'location' in query:
+                    body = f'<?xml version="1.0" encoding="UTF-8"?>\n<LocationConstraint xmlns="{XMLNS}"/>'.encode()
+                    return self._send(200, body, {'Content-Type': 'application/xml'})
+                return self._list(query)
+            path = resolve(root, key)
+            if path is None or not isfile(path):
+                return self._error(404, 'NoSuchKey', f'Key {key} not found', head=head)
+            size = getsize(path)
+            headers = {
+                'ETag': etag(path),
+                'Last-Modified': formatdate(getmtime(path), usegmt=True),
+                'Accept-Ranges': 'bytes',
+                'Content-Type': 'application/octet-stream',
+            }
+            try:
+                rng = parse_range(self.headers.get('Range'), size)
+            except ValueError:
+                return self._error(416, 'InvalidRange', f'Malformed range: {self.headers.get("Range")}', head=head)
+            if rng and (rng[0] >= size or rng[0] > rng[1]):
+                return self._error(416, 'InvalidRange', f'Range {self.headers.get("Range")} not satisfiable ({size} bytes)')
+            start, end = rng or (0, size - 1)
+            n = end - start + 1 if size else 0
+            if head:
+                self.send_response(200)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header('Content-Length', str(size))
+                self.end_headers()
+                return
+            self.send_response(206 if rng else 200)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            if rng:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.send_header('Content-Length', str(n))
+            self.end_headers()
+            with open(path, 'rb') as f:
+                f.seek(start)
+                self._write(f.read(n))
+
+        def _list(self, query: dict):
+            v2 = query.get('list-type') == '2'
+            prefix = query.get('prefix', '')
+            delimiter = query.get('delimiter') or None
+            max_keys = max(0, int(query.get('max-keys') or DEFAULT_MAX_KEYS))
+            url_encode = query.get('encoding-type') == 'url'
+            after = (query.get('continuation-token') or query.get('start-after')) if v2 else query.get('marker')
+            entries = list_entries(root, prefix, delimiter)
+            if after:
+                entries = [ e for e in entries if e[0] > after ]
+            page = entries[:max_keys]
+            # With `max-keys=0`, there's no last key to continue from
+            truncated = len(entries) > max_keys and bool(page)
+
+            def enc(s: str) -> str:
+                return escape(quote(s, safe='/') if url_encode else s)
+
+            parts = [
+                '<?xml version="1.0" encoding="UTF-8"?>',
+                f'<ListBucketResult xmlns="{XMLNS}">',
+                f'<Name>{escape(bucket)}</Name>',
+                f'<Prefix>{enc(prefix)}</Prefix>',
+                f'<MaxKeys>{max_keys}</MaxKeys>',
+                f'<IsTruncated>{"true" if truncated else "false"}</IsTruncated>',
+            ]
+            if delimiter:
+                parts.append(f'<Delimiter>{enc(delimiter)}</Delimiter>')
+            if url_encode:
+                parts.append('<EncodingType>url</EncodingType>')
+            if v2:
+                parts.append(f'<KeyCount>{len(page)}</KeyCount>')
+                if truncated:
+                    parts.append(f'<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>')
+            elif truncated:
+                parts.append(f'<NextMarker>{enc(page[-1][0])}</NextMarker>')
+            for key, path in page:
+                if path is None:
+                    parts.append(f'<CommonPrefixes><Prefix>{enc(key)}</Prefix></CommonPrefixes>')
+                else:
+                    mtime = datetime.fromtimestamp(getmtime(path), timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+                    parts.append(
+                        f'<Contents><Key>{enc(key)}</Key><LastModified>{mtime}</LastModified>'
+                        f'<ETag>{escape(etag(path))}</ETag><Size>{getsize(path)}</Size>'
+                        '<StorageClass>STANDARD</StorageClass></Contents>'
+                    )
+            parts.append('</ListBucketResult>')
+            self._send(200, '\n'.join(parts).encode(), {'Content-Type': 'application/xml'})
+
+        def _read_only(self):
+            if self._admit():
+                self._error(501, 'NotImplemented', 'This emulator is read-only')
+
+        do_PUT = do_POST = do_DELETE = _read_only
+
+    return Handler
+
+
+def serve(
+        root: str,
+        bucket: str = DEFAULT_BUCKET,
+        host: str = 'localhost',
+        port: int = DEFAULT_PORT,
+        latency: float = 0,
+        bandwidth: Optional[float] = None,
+        request_rate: Optional[float] = None,
+        verbose: bool = False,
+) -> tuple[ThreadingHTTPServer, Stats]:
+    """Create (but don't start) a server exposing ``root`` as ``s3://<bucket>/``.
+
+    ``latency`` is in seconds, ``bandwidth`` in bytes/sec (aggregate), ``request_rate`` in requests/sec.
+    """
+    stats = Stats()
+    handler = make_handler(
+        root=root,
+        bucket=bucket,
+        latency=latency,
+        bandwidth=BandwidthCap(bandwidth) if bandwidth else None,
+        limiter=RateLimiter(request_rate) if request_rate else None,
+        stats=stats,
+        verbose=verbose,
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, stats
@@ -0,0 +1,103 @@
+"""Shuffle strategies for ``obs`` joinids, trading off randomness against read locality.
+
+Modes (``alb read-chunks -m/--shuffle-mode``), roughly in order of increasing randomness (and decreasing locality):
+- ``none``: joinid order
+- ``chunk``: shuffle within each contiguous ``chunk_size`` chunk (chunk order preserved)
+- ``runs:<R>``: split into contiguous runs of ``R`` joinids, and shuffle the order of the runs (not their contents)
+- ``window[:<W>]``: split the joinid space into windows of ``W`` (default: ``X``'s obs-dimension tile extent; a multiple
+  of it keeps windows tile-aligned), shuffle the order of the windows, then shuffle within each window
+- ``dataset``: shuffle the order of datasets (by ``obs.dataset_id``), and within each dataset
+- ``global``: shuffle everything
+"""
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+SHUFFLE_MODES = ['none', 'chunk', 'runs', 'window', 'dataset', 'global']
+
+
+@dataclass(frozen=True)
+class Shuffle:
+    mode: str
+    # `runs`: run length; `window`: window size (default: the obs tile extent)
+    size: Optional[int] = None
+
+    @classmethod
+    def parse(cls, s: str) -> 'Shuffle':
+        mode, _, size = s.partition(':')
+        if mode not in SHUFFLE_MODES:
+            raise ValueError(f"Unrecognized shuffle mode: {mode} (options: {', '.join(SHUFFLE_MODES)})")
+        if size and mode not in ('runs', 'window'):
+            raise ValueError(f"Shuffle mode {mode} doesn't take a size: {s}")
+        if mode == 'runs' and not size:
+            raise ValueError("Shuffle mode `runs` requires a run length (e.g. \"runs:64\")")
+        return cls(mode, int(size) if size else None)
+
+    def __str__(self):
+        return f'{self.mode}:{self.size}' if self.size else self.mode
+
+
+def shuffle_groups(
+        joinids: np.ndarray,
+        groups: np.ndarray,
+        rng: np.random.Generator,
+        order: bool = True,
+        within: bool = True,
+) -> np.ndarray:
+    """Reorder ``joinids`` by group (``groups[i]`` is ``joinids[i]``'s group), shuffling the order of the groups (if
+    ``order``) and the elements within each group (if ``within``)."""
+    _, inv = np.unique(groups, return_inverse=True)
+    group_rank = rng.permutation(inv.max() + 1)[inv] if order else inv
+    inner = rng.random(len(joinids)) if within else np.arange(len(joinids))
+    return joinids[np.lexsort((inner, group_rank))]
+
+
+def shuffle_joinids(
+        joinids: np.ndarray,
+        shuffle: Shuffle,
+        chunk_size: int,
+        rng: np.random.Generator,
+        dataset_ids: Optional[np.ndarray] = None,
+        tile_extent: Optional[int] = None,
+) -> np.ndarray:
+    """A shuffled copy of ``joinids``, per ``shuffle`` (see module docstring)."""
+    mode = shuffle.mode
+    positions = np.arange(len(joinids))
+    if mode == 'none':
+        return joinids.copy()
+    elif mode == 'chunk':
+        return shuffle_groups(joinids, positions // chunk_size, rng, order=False)
+    elif mode == 'runs':
+        return shuffle_groups(joinids, positions // shuffle.size, rng, within=False)
+    elif mode == 'window':
+        size = shuffle.size or tile_extent
+        if not size:
+            raise ValueError("Shuffle mode `window` requires a window size (e.g. \"window:2048\"), when the obs tile extent is unknown")
+        return shuffle_groups(joinids, joinids // size, rng)
+    elif mode == 'dataset':
+        if dataset_ids is None:
+            raise ValueError("Shuffle mode `dataset` requires `obs.dataset_id`")
+        return shuffle_groups(joinids, dataset_ids, rng)
+    elif mode == 'global':
+        return rng.permutation(joinids)
+    raise ValueError(f"Unrecognized shuffle mode: {mode}")
+
+
+def obs_tile_extent(X) -> Optional[int]:
+    """``X``'s tile extent along its obs (first) dimension, if the installed ``tiledbsoma`` exposes it."""
+    if not hasattr(X, 'schema_config_options'):
+        return None
+    dims = json.loads(X.schema_config_options().dims)
+    tile = dims.get('soma_dim_0', {}).get('tile')
+    return int(tile) if tile else None
+
+
+def tiles_per_chunk(joinids: np.ndarray, chunk_size: int, tile_extent: int) -> float:
+    """Mean number of distinct obs-dimension tiles (rows of tiles) each ``chunk_size`` chunk of ``joinids`` touches."""
+    counts = [
+        len(np.unique(joinids[idx : idx + chunk_size] // tile_extent))
+        for idx in range(0, len(joinids), chunk_size)
+    ]
+    return float(np.mean(counts)) if counts else 0.
@@ -0,0 +1,102 @@
+"""Steady-state detection for per-batch timings: where warmup ends, and how precisely throughput is known after that.
+
+Warmup is detected with MSER (the "Marginal Standard Error Rule"): the truncation point ``d`` minimizing the squared
+standard error of the mean of the remaining observations, ``SSE(x[d:]) / (n - d)²``. Only truncations within the
+first half of the batches are considered.
+
+Throughput's confidence interval is computed with the "batch means" method (here, "group" means, to avoid overloading
+"batch"): post-warmup batches are split into contiguous groups, and the samples/sec of each group are treated as
+(roughly) independent observations. This is robust to the autocorrelation in batch timings (e.g. a slow batch every
+``gc_freq`` batches, or at each block boundary), as long as each group spans several such periods. With only
+``MIN_GROUPS``..``MAX_GROUPS`` groups, the interval uses a Student-t quantile (a normal one would be too narrow).
+Shuffle-block reads arrive as one slow batch followed by many fast ones, so given a ``period`` (batches per block),
+groups are built from whole periods: no estimate is made until at least ``MIN_GROUPS`` full blocks have been seen
+after warmup.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import math
+
+import numpy as np
+from scipy.stats import t as student_t
+
+# Minimum number of groups (and post-warmup batches per group) needed to estimate a confidence interval
+MIN_GROUPS = 10
+MAX_GROUPS = 30
+
+
+@dataclass
+class SteadyState:
+    warmup_batches: int
+    steady_samples_per_sec: float
+    steady_ci_lo: float
+    steady_ci_hi: float
+
+    @property
+    def rel_ci(self) -> float:
+        """Confidence interval half-width, as a fraction of ``steady_samples_per_sec``."""
+        return (self.steady_ci_hi - self.steady_ci_lo) / 2 / self.steady_samples_per_sec
+
+
+def mser(x: np.ndarray) -> int:
+    """MSER truncation point of ``x``: the number of initial observations to discard as warmup."""
+    n = len(x)
+    if n < 2:
+        return 0
+    x = x.astype(float)
+    # Suffix sums (of x and x²), so that each candidate truncation's SSE is O(1)
+    s1 = np.cumsum(x[::-1])[::-1]
+    s2 = np.cumsum((x * x)[::-1])[::-1]
+    m = np.arange(n, 0, -1)
+    d_max = n // 2 + 1
+    sse = s2[:d_max] - s1[:d_max] ** 2 / m[:d_max]
+    return int(np.argmin(sse / m[:d_max] ** 2))
+
+
+def block_period(batch_size: Optional[int], block_size: Optional[int]) -> int:
+    """Number of batches per shuffle block (at least 1)."""
+    if not batch_size or not block_size:
+        return 1
+    return max(1, math.ceil(block_size / batch_size))
+
+
+def steady_state(
+        elapsed_ns: np.ndarray,
+        n_rows: np.ndarray,
+        level: float = 0.95,
+        period: int = 1,
+) -> Optional[SteadyState]:
+    """Detect warmup in per-batch timings, and estimate post-warmup samples/sec with a ``level`` confidence interval.
+
+    Groups consist of whole ``period``s (e.g. batches per shuffle block; see ``block_period``), and contain at least
+    ``MIN_GROUPS`` batches each. Returns ``None`` if there are too few post-warmup batches to estimate a confidence
+    interval.
+    """
+    n = len(elapsed_ns)
+    period = max(period, 1)
+    if n < 2 * MIN_GROUPS * period:
+        return None
+    ns_per_row = elapsed_ns / np.maximum(n_rows, 1)
+    warmup = mser(ns_per_row)
+    elapsed_ns, n_rows = elapsed_ns[warmup:], n_rows[warmup:]
+    n_periods = len(elapsed_ns) // period
+    min_periods_per_group = math.ceil(MIN_GROUPS / period)
+    num_groups = min(MAX_GROUPS, n_periods // min_periods_per_group)
+    if num_groups < MIN_GROUPS:
+        return None
+    group_size = (n_periods // num_groups) * period
+    # Drop the remainder from the front (i.e. closest to warmup)
+    k = num_groups * group_size
+    group_ns = elapsed_ns[-k:].reshape(num_groups, group_size).sum(axis=1)
+    group_rows = n_rows[-k:].reshape(num_groups, group_size).sum(axis=1)
+    rates = group_rows / (group_ns / 1e9)
+    samples_per_sec = n_rows.sum() / (elapsed_ns.sum() / 1e9)
+    q = student_t.ppf((1 + level) / 2, df=num_groups - 1)
+    half_width = q * rates.std(ddof=1) / np.sqrt(num_groups)
+    return SteadyState(
+        warmup_batches=warmup,
+        steady_samples_per_sec=float(samples_per_sec),
+        steady_ci_lo=float(samples_per_sec - half_width),
+        steady_ci_hi=float(samples_per_sec + half_width),
+    )
@@ -0,0 +1,155 @@
+"""Parse "sweep" specs (lists / geometric or arithmetic ranges of values), and expand them into grids of configs.
+
+Grammar (comma-delimited elements, each a single value or a range):
+- ``1024``, ``256M``, ``true``, ``np.array``: single values (see ``parse_value``)
+- ``256..4096``: powers-of-2 range (inclusive), equivalent to ``256..4096:x2``
+- ``256..4096:x4``: geometric range (multiply by 4 each step); factors may be decimals (``256..4096:x1.5``), as long
+  as integer bounds yield integer values
+- ``1..10:+3``: arithmetic range (``1,4,7,10``); bounds and step may be decimals (``0..1:+0.25``)
+- ``256M,1G``, ``1..4,64``: comma-separated values and/or ranges
+"""
+import math
+import re
+from itertools import product
+from typing import Callable, Optional
+
+import click
+import yaml
+
+
+def pows(start: int, stop: int, pow: int = 2):
+    if start <= 0:
+        raise ValueError(f"Geometric range must start at a positive value: {start}")
+    rv = []
+    while start <= stop:
+        rv.append(start)
+        start *= pow
+    return rv
+
+
+def arange(start, stop, step) -> list:
+    """``start``, ``start + step``, …, up to ``stop`` (inclusive); unlike ``range``, also works for floats."""
+    if step <= 0:
+        raise ValueError(f"Arithmetic range step must be positive: {step}")
+    n = math.floor((stop - start) / step + 1e-9) + 1
+    rv = [ start + i * step for i in range(max(n, 0)) ]
+    if any(isinstance(v, float) for v in rv):
+        # Avoid accumulated float error, e.g. 0.30000000000000004
+        rv = [ round(v, 12) for v in rv ]
+    return rv
+
+
+SIZE_RGX = re.compile(r'(?P<num>\d+(?:\.\d+)?) *(?P<unit>[kmgt]?)(?:i?b)?', re.IGNORECASE)
+SIZE_UNITS = { '': 0, 'k': 1, 'm': 2, 'g': 3, 't': 4 }
+
+
+def parse_size(s: str | int | None) -> int | None:
+    """Parse a byte-size string like "256M" or "1.5G" (binary units) into an integer."""
+    if s is None or isinstance(s, int):
+        return s
+    m = SIZE_RGX.fullmatch(s.strip())
+    if not m:
+        raise ValueError(f"Unrecognized size: {s}")
+    return int(float(m['num']) * 1024 ** SIZE_UNITS[m['unit'].lower()])
+
+
+def parse_value(s: str):
+    """Best-effort typing of a sweep value: bool, int, float, byte-size ("256M"), or (fallback) string."""
+    if not isinstance(s, str):
+        return s
+    s = s.strip()
+    if s.lower() in ('true', 'false'):
+        return s.lower() == 'true'
+    for fn in (int, float, parse_size):
+        try:
+            return fn(s)
+        except ValueError:
+            pass
+    return s
+
+
+RANGE_RGX = re.compile(r'(?P<start>[^:]+?)\.\.(?P<stop>[^:]+?)(?::(?P<op>[x+])(?P<step>\d+(?:\.\d+)?))?')
+
+
+def parse_sweep(spec, fn: Callable = parse_value) -> list:
+    """Expand a sweep spec (string, scalar, or list thereof) into a list of values, each parsed by ``fn``."""
+    if spec is None:
+        return []
+    if isinstance(spec, (list, tuple)):
+        return [ v for elem in spec for v in parse_sweep(elem, fn=fn) ]
+    if not isinstance(spec, str):
+        return [spec]
+    rv = []
+    for elem in spec.split(','):
+        elem = elem.strip()
+        m = RANGE_RGX.fullmatch(elem)
+        if m:
+            start, stop = fn(m['start']), fn(m['stop'])
+            op = m['op'] or 'x'
+            step = parse_value(m['step'] or '2')
+            if op == 'x':
+                if step <= 1:
+                    raise ValueError(f"Geometric range factor must be >1: {elem}")
+                if start <= 0:
+                    raise ValueError(f"Geometric range must start at a positive value (e.g. \"0,1..16\" instead of \"0..16\"): {elem}")
+                values = pows(start, stop, pow=step)
+            else:
+                values = arange(start, stop, step)
+            if not values:
+                raise ValueError(f"Empty range (start > stop?): {elem}")
+            if all(isinstance(v, int) and not isinstance(v, bool) for v in (start, stop)):
+                # Integer bounds (e.g. batch sizes) ⇒ integer values, even with a fractional step/factor
+                bad = [ v for v in values if not float(v).is_integer() ]
+                if bad:
+                    raise ValueError(f"Range over integers yields non-integer values ({', '.join(map(str, bad))}): {elem}")
+                values = [ int(v) for v in values ]
+            rv.extend(fn(v) for v in values)
+        else:
+            rv.append(fn(elem))
+    return rv
+
+
+def sweep_arg(fn: Callable = parse_value, default=None):
+    """``click`` callback parsing an option value as a sweep spec."""
+    def _sweep_arg(ctx, param, value):
+        if value is None or value == ():
+            return default
+        try:
+            return parse_sweep(value, fn=fn)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return _sweep_arg
+
+
+def parse_kv_sweeps(kvs: tuple[str, ...] | list[str], fn: Callable = parse_value) -> dict[str, list]:
+    """Parse ``<key>=<sweep spec>`` strings (e.g. from a repeatable CLI option) into ``{key: values}``."""
+    rv = {}
+    for kv in kvs:
+        if '=' not in kv:
+            raise ValueError(f"Expected <key>=<values>: {kv}")
+        k, v = kv.split('=', 1)
+        rv[k.strip()] = parse_sweep(v, fn=fn)
+    return rv
+
+
+def expand(axes: dict[str, list]) -> list[dict]:
+    """Cartesian product of ``axes`` (earlier axes vary slowest)."""
+    keys = list(axes)
+    return [ dict(zip(keys, vals)) for vals in product(*axes.values()) ]
+
+
+def filter_points(points: list[dict], expr: Optional[str], env: Callable[[dict], dict] = dict) -> list[dict]:
+    """Keep points for which the Python expression ``expr`` is truthy; ``env(point)`` provides its variables."""
+    if not expr:
+        return points
+    code = compile(expr, '<filter>', 'eval')
+    return [ point for point in points if eval(code, {'__builtins__': {}}, env(point)) ]
+
+
+def load_grid(path: str) -> dict:
+    """Load a YAML "grid" file: a mapping from axis names to sweep specs (strings, scalars, or lists)."""
+    with open(path, 'r') as f:
+        grid = yaml.safe_load(f) or {}
+    if not isinstance(grid, dict):
+        raise ValueError(f"{path}: expected a mapping of axis names to values")
+    return grid
@@ -0,0 +1,42 @@
+import json
+from typing import Optional
+
+from benchmarks.sweep import parse_kv_sweeps
+
+# Column-name prefix for swept TileDB config params (e.g. `tiledb.sm.compute_concurrency_level`)
+PREFIX = 'tiledb.'
+
+# Config params whose effective values (incl. defaults, which may depend on e.g. the number of cores) are persisted,
+# along with any that were explicitly set
+TILEDB_CONFIG_KEYS = [
+    'py.init_buffer_bytes',
+    'soma.init_buffer_bytes',
+    'sm.compute_concurrency_level',
+    'sm.io_concurrency_level',
+    'sm.tile_cache_size',
+    'vfs.file.max_parallel_ops',
+    'vfs.s3.max_parallel_ops',
+    'vfs.s3.region',
+]
+
+
+def tiledb_config_axes(kvs: tuple[str, ...] | list[str]) -> dict[str, list]:
+    """Parse ``-T <key>=<sweep spec>`` args into sweep axes named ``tiledb.<key>``."""
+    return { f'{PREFIX}{k}': v for k, v in parse_kv_sweeps(kvs).items() }
+
+
+def point_tiledb_config(point: dict) -> dict:
+    """TileDB config params set by a sweep point's ``tiledb.<key>`` axes."""
+    return {
+        k.removeprefix(PREFIX): v
+        for k, v in point.items()
+        if k.startswith(PREFIX)
+    }
+
+
+def effective_tiledb_config(context, tiledb_config: Optional[dict] = None) -> str:
+    """JSON-serialize the effective values (from a ``SOMATileDBContext``) of ``TILEDB_CONFIG_KEYS`` and any params
+    explicitly set in ``tiledb_config``."""
+    config = context.tiledb_config
+    keys = sorted(set(TILEDB_CONFIG_KEYS) | set(tiledb_config or {}))
+    return json.dumps({ k: str(config[k]) for k in keys if k in config }, sort_keys=True)
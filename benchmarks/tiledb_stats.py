@@ -0,0 +1,114 @@
+"""TileDB's internal stats (timers and counters, via ``tiledbsoma_stats_*``), parsed into structured columns.
+
+Stat names are hierarchical (e.g. ``Context.StorageManager.Query.Reader.num_tiles_read``), and their prefixes vary
+across TileDB versions, so each column sums the stats whose names end with any of its suffixes. Timers are summed
+across threads, so e.g. ``tdb_unfilter_s`` can exceed an epoch's wall-clock ``elapsed``.
+
+TileDB stats are per-process: only reads in the benchmarking process are observed (not e.g. in ``DataLoader`` worker
+processes).
+"""
+import json
+import os
+import sys
+from tempfile import TemporaryFile
+
+import tiledbsoma
+
+PREFIX = 'tdb_'
+
+# Column name → suffixes of the counters it sums
+COUNTERS = {
+    'read_bytes': ['VFS.read_byte_num'],
+    'read_ops': ['VFS.read_ops_num'],
+    'tiles_read': ['.num_tiles_read'],
+    'unfiltered_bytes': ['.read_unfiltered_byte_num'],
+}
+# Column name → suffixes of the timers it sums (in seconds)
+TIMERS = {
+    'read_tiles_s': ['.read_attribute_tiles.sum', '.read_coordinate_tiles.sum'],
+    'unfilter_s': ['.unfilter_attr_tiles.sum', '.unfilter_coord_tiles.sum'],
+    'load_offsets_s': ['.load_tile_offsets.sum'],
+    'copy_s': ['.copy_attribute.sum', '.copy_attr_values.sum', '.copy_coordinates.sum'],
+}
+
+
+def stats_json() -> str:
+    """TileDB's current stats, as a JSON string."""
+    if hasattr(tiledbsoma, 'tiledbsoma_stats_json'):
+        return tiledbsoma.tiledbsoma_stats_json()
+    # Older versions only print the stats (from C++, to the stdout file descriptor)
+    sys.stdout.flush()
+    stdout_fd = os.dup(1)
+    with TemporaryFile('w+') as tmp:
+        os.dup2(tmp.fileno(), 1)
+        try:
+            tiledbsoma.tiledbsoma_stats_dump()
+        finally:
+            os.dup2(stdout_fd, 1)
+            os.close(stdout_fd)
+        tmp.seek(0)
+        return tmp.read()
+
+
+def parse_stats(s: str) -> tuple[dict, dict]:
+    """Timers and counters from a TileDB stats dump (one or more JSON ``{"timers":…,"counters":…}`` objects, possibly
+    preceded by a non-JSON header)."""
+    timers, counters = {}, {}
+    start = min([ i for i in (s.find('['), s.find('{')) if i >= 0 ], default=-1)
+    if start < 0:
+        return timers, counters
+    obj, _ = json.JSONDecoder().raw_decode(s[start:])
+    for entry in obj if isinstance(obj, list) else [obj]:
+        for k, v in entry.get('timers', {}).items():
+            timers[k] = timers.get(k, 0) + v
+        for k, v in entry.get('counters', {}).items():
+            counters[k] = counters.get(k, 0) + v
+    return timers, counters
+
+
+def _sum(stats: dict, suffixes: list[str]):
+    return sum(v for k, v in stats.items() if any(k.endswith(suffix) for suffix in suffixes))
+
+
+class TiledbStats:
+    """Enable (and reset) TileDB stats for the duration of the context, then parse them (see ``summary``)."""
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+
+    def __enter__(self) -> 'TiledbStats':
+        tiledbsoma.tiledbsoma_stats_reset()
+        tiledbsoma.tiledbsoma_stats_enable()
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.timers, self.counters = parse_stats(stats_json())
+        finally:
+            tiledbsoma.tiledbsoma_stats_disable()
+            tiledbsoma.tiledbsoma_stats_reset()
+
+    def summary(self) -> dict:
+        """``tdb_``-prefixed columns: bytes / ops read (by the VFS), tiles read, bytes unfiltered, time spent
+        reading / unfiltering (decompressing) tiles, loading tile offsets, and copying results; the number of S3
+        requests (if TileDB reports them; otherwise ``tdb_read_ops`` approximates the number of GETs); and all raw
+        (``.sum``) timers and counters, as JSON."""
+        s3_counters = { k: v for k, v in self.counters.items() if '.S3.' in k }
+        return {
+            **{ f'{PREFIX}{col}': int(_sum(self.counters, suffixes)) for col, suffixes in COUNTERS.items() },
+            **{ f'{PREFIX}{col}': float(_sum(self.timers, suffixes)) for col, suffixes in TIMERS.items() },
+            f'{PREFIX}s3_requests': int(_sum(s3_counters, ['_num'])) if s3_counters else None,
+            f'{PREFIX}stats': json.dumps(dict(
+                timers={ k: v for k, v in self.timers.items() if k.endswith('.sum') },
+                counters=self.counters,
+            ), sort_keys=True),
+        }
+
+    def describe(self) -> str:
+        """One-line human-readable summary."""
+        s = self.summary()
+        return ', '.join(
+            f'{k.removeprefix(PREFIX)}={v:.3f}' if isinstance(v, float) else f'{k.removeprefix(PREFIX)}={v}'
+            for k, v in s.items()
+            if k != f'{PREFIX}stats' and v is not None
+        )
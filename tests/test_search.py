@@ -0,0 +1,33 @@
+import pandas as pd
+
+from benchmarks.data_loader.search import successive_halving
+
+
+def test_probe_floor_grows_each_round():
+    # Configs' min-batches floors (256, 512) exceed the per-round budgets (64, 128, …); each round must still probe
+    # survivors for longer than the last, rather than re-running them at the same (floored) length
+    floors = { 'a': 256, 'b': 512, 'c': 256, 'd': 256 }
+    rates = { 'a': 4., 'b': 3., 'c': 2., 'd': 1. }
+    runs = []
+
+    def run(candidate, max_batches, num_epochs, search_round):
+        runs.append((candidate, max_batches, search_round))
+        return pd.DataFrame([dict(n_rows=rates[candidate] * max_batches, elapsed=float(max_batches), max_mem=1.)])
+
+    frontier = successive_halving(
+        list(floors),
+        run,
+        max_batches=2048,
+        num_epochs=1,
+        probe_batches=64,
+        factor=2,
+        min_batches=floors.get,
+    )
+    assert frontier == ['a']
+    lens = {}
+    for candidate, n, search_round in runs:
+        lens.setdefault(candidate, []).append(n)
+    for candidate, ns in lens.items():
+        assert ns == sorted(set(ns)), f'{candidate} re-probed at the same length: {ns}'
+    assert lens['a'] == [256, 512, 2048]
+    assert lens['b'][0] == 512
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.sweep import parse_size, parse_sweep
+
+
+def test_fractional_factor_int_axis():
+    values = parse_sweep('256..4096:x1.5', fn=int)
+    assert values == [256, 384, 576, 864, 1296, 1944, 2916]
+    assert all(type(v) is int for v in values)
+
+
+def test_fractional_factor_size_axis():
+    assert parse_sweep('256M..1G:x1.5', fn=parse_size) == [256 * 2**20, 384 * 2**20, 576 * 2**20, 864 * 2**20]
+
+
+def test_fractional_values_on_int_axis():
+    with pytest.raises(ValueError, match='non-integer'):
+        parse_sweep('100..1000:x1.5', fn=int)
+
+
+def test_decimal_ranges():
+    assert parse_sweep('0..1:+0.25', fn=float) == [0., .25, .5, .75, 1.]
+    assert parse_sweep('1..10:+3', fn=int) == [1, 4, 7, 10]
+    assert parse_sweep('0,1..16') == [0, 1, 2, 4, 8, 16]